@@ -0,0 +1,171 @@
+"""Ingest benchmarks on synthetic drops: wall time, peak RSS and cache size per scale.
+
+    python -m benchmarks.ingest_benchmark --scales 1m,10m,50m --stages ingest,reingest,publish
+
+Every stage runs in a fresh interpreter, so its peak RSS is not inflated by
+earlier stages. The peak is of the summed RSS of the stage process and all its
+descendants, which includes the forkserver and the ingest pool workers. Source files are generated
+once into the work directory and reused on later runs.
+"""
+import sys
+import json
+import time
+import shutil
+import argparse
+import psutil
+import threading
+import subprocess
+from pathlib import Path
+
+from src.constants import *
+from src.utils.synthetic_data import SCALES, generate_source
+
+STAGES = {
+    "ingest": "first ingest of the drop into an empty cache",
+    "reingest": "ingest of the same drop again, which only checks its size and modification time",
+    "publish": "cold start of the ingest worker on the built cache, what `data_loader` serves",
+    "legacy": "`load_and_process` with `optimize_data_types` into a DataFrame, the pre-streaming path",
+}
+
+
+class TreeRssSampler:
+    """Peak summed RSS of this process and all its descendants, sampled on a thread.
+
+    Pool workers started from a forkserver are not children of this process,
+    so `RUSAGE_CHILDREN` never sees them, they are found through the process tree.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def tree_rss(self) -> int:
+        process = psutil.Process()
+        total = 0
+        for member in [process, *process.children(recursive=True)]:
+            try:
+                total += member.memory_info().rss
+            except psutil.Error:
+                # Workers may exit between listing and reading them
+                pass
+        return total
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.tree_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "TreeRssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.tree_rss())
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / 1024**2
+
+
+def path_size_mb(path: Path) -> float:
+    """Size of a cache file or directory, in MB."""
+    files = [path] if path.is_file() else [file for file in path.rglob("*") if file.is_file()]
+    return sum(file.stat().st_size for file in files) / 1024**2
+
+
+def run_stage(stage: str, source: Path, cache_dir: Path, cache_format: str) -> dict:
+    """Run one stage in this process, with the cache redirected to `cache_dir`."""
+    import src.llm_code.data_processor_and_loader as loader
+    import src.llm_code.ingest_worker as worker
+
+    for module in (loader, worker):
+        module.CACHED_PATH = cache_dir
+        module.CACHE_FORMAT = cache_format
+
+    start = time.perf_counter()
+    with TreeRssSampler() as sampler:
+        if stage in ("ingest", "reingest"):
+            loader.ingest_sources([source])
+        elif stage == "publish":
+            worker.cache_version()
+            loader.latest_month_year(worker.open_dataset(loader.cache_location()))
+        elif stage == "legacy":
+            loader.load_and_process(source)
+    wall = time.perf_counter() - start
+
+    cache = loader.cache_location()
+    return {
+        "wall_s": round(wall, 2),
+        "peak_rss_mb": round(sampler.peak_mb),
+        "cache_mb": round(path_size_mb(cache), 1) if cache.exists() else None,
+    }
+
+
+def benchmark(scale: str, stages: list[str], workdir: Path, cache_format: str) -> list[dict]:
+    """Generate the drop of a scale if needed and run each stage in a subprocess."""
+    source_dir = workdir.joinpath(f"source-{scale}")
+    source_dir.mkdir(parents=True, exist_ok=True)
+    source = source_dir.joinpath(f"synthetic-{scale}.gz")
+    if not source.exists():
+        start = time.perf_counter()
+        generate_source(source, SCALES.get(scale) or int(scale))
+        print(f"Generated {source.name} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    cache_dir = workdir.joinpath(f"cache-{scale}-{cache_format}")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    cache_dir.mkdir(parents=True)
+
+    results = []
+    for stage in stages:
+        command = [
+            sys.executable, "-m", "benchmarks.ingest_benchmark", "--child", stage,
+            "--source", source.as_posix(), "--cache-dir", cache_dir.as_posix(), "--format", cache_format,
+        ]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append({"scale": scale, "format": cache_format, "stage": stage, **result})
+        print(json.dumps(results[-1]), file=sys.stderr)
+    return results
+
+
+def print_table(results: list[dict]) -> None:
+    """Print the results as a plain text table."""
+    header = f"{'scale':>6} {'format':>8} {'stage':>9} {'wall s':>9} {'peak RSS MB':>12} {'cache MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        cache_mb = "-" if row["cache_mb"] is None else f"{row['cache_mb']:.1f}"
+        print(
+            f"{row['scale']:>6} {row['format']:>8} {row['stage']:>9} {row['wall_s']:>9.2f} "
+            f"{row['peak_rss_mb']:>12} {cache_mb:>9}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1m,10m,50m", help=f"comma separated, from {', '.join(SCALES)} or row counts")
+    parser.add_argument("--stages", default="ingest,reingest,publish", help=f"comma separated, from {', '.join(STAGES)}")
+    parser.add_argument("--formats", default=CACHE_FORMAT, help="comma separated cache formats")
+    parser.add_argument("--workdir", type=Path, default=DATA_PATH.joinpath("benchmarks"))
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    parser.add_argument("--child", choices=list(STAGES), help=argparse.SUPPRESS)
+    parser.add_argument("--source", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--format", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child, args.source, args.cache_dir, args.format)))
+        sys.exit()
+
+    results = []
+    for scale in args.scales.split(","):
+        for cache_format in args.formats.split(","):
+            results += benchmark(scale, args.stages.split(","), args.workdir, cache_format)
+    print_table(results)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
@@ -90,6 +90,15 @@ class AWSConfig:
             logger.error(e)
             return False
 
+    def get_file_info(self, remote_path: Path) -> dict | None:
+        try:
+            return self.get_client().head_object(
+                Bucket=self.bucket_name, Key=remote_path.as_posix()
+            )
+        except ClientError as e:
+            logger.error(e)
+            return None
+
     def delete_file(self, remote_path: Path) -> bool:
         try:
             self.get_client().delete_object(
@@ -3,7 +3,7 @@ import pandas as pd
 from datetime import datetime
 from streamlit_lottie import st_lottie
 
-from src.llm_code.data_processor_and_loader import data_loader
+from src.llm_code.ingest_worker import data_loader
 from src.llm_code.sql_gen_and_exec import *
 from src.llm_code.streamlit_helper import *
 from src.constants.app_constant import MODE_DISPLAY
@@ -29,6 +29,9 @@ render_contextual_limits()
 
 
 llm_df = data_loader()
+if llm_df is None:
+    st.info("The dataset is being prepared, please check back in a few minutes.")
+    st.stop()
 
 if st.session_state.chat_mode == "Comparision Query":
     selections = get_comparison_year_month(llm_df)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from config.aws_configuration import AWSConfig
@@ -55,8 +56,9 @@ def download_file_from_s3bucket(
             .joinpath(REMOTE_DEFAULT_DATA_DIRECTORY)
         )
 
+        aws = AWSConfig()
         # last added remote path is considered as path to remote file
-        if last_added_remote_file := AWSConfig.get_last_added_remote_file(
+        if last_added_remote_file := aws.get_last_added_remote_file(
             remote_path=remote_directory
         ):
             last_added_remote_file: Path = Path(last_added_remote_file)
@@ -65,8 +67,20 @@ def download_file_from_s3bucket(
             logger.info(f"Remote File Path: {last_added_remote_file.as_posix()}")
             logger.info(f"Local File Path: {save_path.as_posix()}")
 
-            if AWSConfig.downlaod_file(local_path=save_path, remote_path=last_added_remote_file):
+            # the local copy keeps the object's size and modified time, so an
+            # unchanged object is not downloaded again on every poll
+            remote_info = aws.get_file_info(remote_path=last_added_remote_file)
+            remote_mtime = remote_info["LastModified"].timestamp() if remote_info else None
+            if remote_info and save_path.exists():
+                local_stat = save_path.stat()
+                if (local_stat.st_size, local_stat.st_mtime) == (remote_info["ContentLength"], remote_mtime):
+                    logger.info(f"File already downloaded: {save_path.name}. Skipping download.")
+                    return None
+
+            if aws.download_file(local_path=save_path, remote_path=last_added_remote_file):
                 logger.info("File Download Status: SUCCESS")
+                if remote_mtime is not None:
+                    os.utime(save_path, (remote_mtime, remote_mtime))
                 return save_path
             else:
                 logger.info("File Download Status: FAILED")
@@ -70,6 +70,119 @@ COLUMNS_MAP = {
 
 DEFAULT_FILL_VALUE = "UNK"
 
+# Output columns holding text, every other COLUMNS_MAP column is numeric
+STRING_COLUMNS = [
+    "brand", "sku", "variant", "packtype",
+    "region", "city", "area", "territory", "distributor", "route", "customer",
+]
+
+# Numeric output columns that the source files hold as True/False flags
+FLAG_COLUMNS = ["productivity", "stockout", "assortment"]
+
+# Dimension tables of the DuckDB store, each keyed by an integer surrogate key.
+# Off by default: queries the rollups cannot answer, e.g. by customer or sku,
+# pay the three joins of the `llm_df` view and ran slower than on the flat table
+DUCKDB_STAR_SCHEMA = False
+DIMENSIONS = {
+    "location": ["region", "city", "area", "territory", "distributor", "route"],
+    "customer": ["customer"],
+    "product": ["sku", "brand", "variant", "packtype"],
+}
+DIMENSION_COLUMNS = [col for columns in DIMENSIONS.values() for col in columns]
+HIERARCHY_COLUMNS = DIMENSIONS["location"]
+
+# Per hierarchy level x (year, month) SUM rollups of the DuckDB store, used by query routing
+ROLLUPS_ENABLED = True
+ROLLUP_ROW_COUNT = "rollup_rows"
+
+# Streaming ingest of gzip drops, rows per record batch
+STREAMING_INGEST = True
+STREAM_BATCH_ROWS = 500_000
+
+# CSV parser of the streaming ingest: "arrow" parses with pyarrow.csv straight
+# into the declared column types, "pandas" is the chunked pandas reader
+CSV_READER = "arrow"
+
+# Processes used to ingest several source files in parallel, None for every core
+INGEST_WORKERS = None
+
+# Source files may split a month by this column, e.g. one file per region, so
+# rows are only skipped as already cached per (year, month, value)
+SOURCE_PARTITION_COLUMN = "region"
+
+# Background ingest worker: where new drops come from, besides files already in
+# DOWNLOADS_PATH ("local" | "s3" | "gdrive"), and how often it looks for them
+INGEST_SOURCE = "local"
+INGEST_POLL_SECONDS = 300
+
+# Cache format: "duckdb" for a persistent DuckDB database file, "parquet" for a
+# hive style `year=/month=` partitioned dataset directory, "arrow" for an
+# uncompressed Arrow IPC file that is memory-mapped on load
+CACHE_FORMAT = "duckdb"
+CACHE_NAME = "llm_data"
+DUCKDB_SUFFIX = ".duckdb"
+DATASET_SUFFIX = ".parquet"
+ARROW_SUFFIX = ".arrow"
+CACHE_SUFFIXES = {"duckdb": DUCKDB_SUFFIX, "parquet": DATASET_SUFFIX, "arrow": ARROW_SUFFIX}
+PARTITION_COLUMNS = ["year", "month"]
+INGEST_MEMORY_LIMIT = "1GB"
+
+# How queries reach the cache: "store" scans it in place, "arrow" loads it once
+# into an in-memory Arrow table that DuckDB scans zero-copy
+DATASET_BACKEND = "store"
+
+# LRU cache of query results in front of execute_sql, keyed by the canonical
+# SQL and the dataset version, holding Arrow tables up to a byte budget
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_BYTES = 256 * 1024**2
+
+# Cost guard for generated SQL: a query that never mentions month or year and
+# would scan more rows is restricted to the latest month, and a query returning
+# more rows gets a LIMIT. The LIMIT is kept well above RESULT_MAX_ROWS, the
+# rows past the first page are paged in
+GUARD_ENABLED = True
+GUARD_MAX_SCAN_ROWS = 5_000_000
+GUARD_MAX_RESULT_ROWS = 1_000_000
+
+# Queries run on a pool of worker threads, the script thread polls them and
+# interrupts a query still running after the timeout
+QUERY_WORKERS = 4
+QUERY_TIMEOUT_SECONDS = 60
+QUERY_POLL_SECONDS = 0.25
+
+# DuckDB resource profile per query class. These settings apply to a whole
+# DuckDB database, so every profile runs on a database of its own, spilling
+# to SPILL_PATH/<profile> past its memory limit. A deployment overrides a
+# setting with a QUERY_<PROFILE>_<SETTING> environment variable or config.env
+# entry, e.g. QUERY_MAIN_MEMORY_LIMIT=8GB
+QUERY_PROFILES = {
+    "main": {"threads": 4, "memory_limit": "4GB", "preserve_insertion_order": True},
+    "why": {"threads": 2, "memory_limit": "1GB", "preserve_insertion_order": False},
+}
+
+# Query results are fetched as Arrow record batches and only the first
+# RESULT_MAX_ROWS rows are kept, later rows are paged in on demand
+RESULT_BATCH_ROWS = 10_000
+RESULT_MAX_ROWS = 10_000
+
+# Capture DuckDB's JSON profile of every query into its chat history entry and
+# the rotating profile log under PROFILE_LOG_PATH
+QUERY_PROFILING = False
+
+# Ranking, growth and productivity/stockout/assortment questions of a known
+# shape are answered from SQL templates, without a call to the LLM
+INTENT_TEMPLATES_ENABLED = True
+
+# MRO breakdown summed by the "why" analysis, each part is shown as a share of the first
+WHY_COLUMNS = ["mro", "unproductive_mro", "unassorted_mro", "stockout_mro"]
+# Compute the "why" breakdown of every stored result in the background, one at
+# a time on the "why" profile, so the button shows it without waiting
+WHY_SPECULATIVE = True
+
+# Bump to force a cache rebuild when processing changes outside the fingerprinted code
+PROCESSING_VERSION = 1
+FINGERPRINT_LENGTH = 16
+
 
 MODE_DISPLAY = {
     "Single Query Mode": "Single Query",
@@ -84,4 +197,13 @@ KEYWORD_GROUPBY_MAP = {
         r"\barea(s)?\b": "region, city, area",
         r"\bcity|cities\b": "region, city",
         r"\bregion(s)?\b": "region",
-    }
\ No newline at end of file
+    }
+# Measure columns by the words questions use for them, checked in order, so
+# "sales shortfall" is read as mto before "sales" is matched
+METRIC_KEYWORD_MAP = {
+        r"\b(mto|missed targets?( opportunity)?|target missed|sales shortfall|performance gap|missed goals?)\b": "mto",
+        r"\b(mro|missed revenue( opportunity)?|potential improvement|missed gain|untapped potential|lost earnings?)\b": "mro",
+        r"\bprimary sales\b": "primary sales",
+        r"\b(sales|contribution|contributed)\b": "sales",
+        r"\btargets?\b": "target",
+    }
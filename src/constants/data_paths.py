@@ -9,6 +9,7 @@ CITY = "karachi"
 DATA_PATH = FILE_PATH.joinpath("data")
 
 LOG_PATH = FILE_PATH.joinpath("logs")
+PROFILE_LOG_PATH = LOG_PATH.joinpath("profiles")
 
 
 # Downloads , Upliads, Cached
@@ -19,6 +20,10 @@ UPLOADS_PATH = DATA_PATH.joinpath(f"uploads")
 CACHED_PATH = DATA_PATH.joinpath(f"cached")
 if not CACHED_PATH.exists():
     CACHED_PATH.mkdir(parents=True, exist_ok=True)
+# DuckDB spills large query operators here, one directory per query profile
+SPILL_PATH = DATA_PATH.joinpath(f"spill")
+if not SPILL_PATH.exists():
+    SPILL_PATH.mkdir(parents=True, exist_ok=True)
 
 # AWS UPLOAD PATH SETTING
 REMOTE_DEFAULT_DATA_DIRECTORY = "_data"
@@ -6,7 +6,7 @@ import pandas as pd
 from src.llm_code.streamlit_helper import (
     build_contextual_question, latest_month_year, generate_enhanced_question,
     check_specific_word, check_month_in_question, generate_sql_openai,
-    execute_sql, display_summary, display_chart_analytics, display_table,
+    query_result, display_summary, display_chart_analytics, display_table,
     get_why_result, store_query_result, re_write_query_with_month, write_question
 )
 from src.llm_code.streamlit_helper import NO_DATA_ANIM, LOADING_ANIM
@@ -55,7 +55,7 @@ def context_query (user_input, llm_df):
                 progress_bar = st.progress(0)
                 anim_placeholder = st.empty()
                 step_placeholder = st.empty()
-                sql_query, df_result = None, None
+                sql_query, df_result, result = None, None, None
 
                 with anim_placeholder:
                     st_lottie(LOADING_ANIM, height=200, key="loader")
@@ -70,7 +70,11 @@ def context_query (user_input, llm_df):
                         logger.info(f"Generated SQL Query \n {sql_query}")
 
                     if "Searching Database" in step:
-                        result_data = execute_sql(sql_query, llm_df)
+                        result = query_result(
+                            sql_query, llm_df,
+                            on_wait=lambda elapsed: step_placeholder.write(f"### {step} ({elapsed:.0f}s)"),
+                        )
+                        result_data = result.to_pandas() if result is not None else None
                         df_result = result_data if isinstance(result_data, pd.DataFrame) else pd.DataFrame(result_data)
                 
                 anim_placeholder.empty()
@@ -90,7 +94,7 @@ def context_query (user_input, llm_df):
                     st.subheader("📈 Chart Analytics")
                     with st.container():
                         current_fig, chart_config, unique_key = display_chart_analytics(
-                            df_result.copy(), unique_key=unique_key, is_editable=True
+                            df_result, unique_key=unique_key, is_editable=True
                         )
 
                 st.subheader("📋 Result View")
@@ -111,6 +115,7 @@ def context_query (user_input, llm_df):
                     sql_query=sql_query,
                     why_result=why_result if st.session_state.show_why else None,
                     unique_key=unique_key,
+                    result=result,
                 )
 
                 st.session_state.query_processed = True
@@ -1,17 +1,28 @@
+import os
 import re
+import json
+import shutil
 import hashlib
+import inspect
+import multiprocessing
 import pandas as pd
 import numpy as np
-import streamlit as st
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 from pathlib import Path
-from typing import Tuple
+from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, Tuple
 
 
-from src.connector_aws_gdrive.aws_funcs import *
-from src.connector_aws_gdrive.gdrive_funcs import *
 from src.constants import *
 from src.utils.logging import logger
-from src.utils.decorator import time_checker
+from .query_router import append_rollups, rollup_ddl, rollup_measures
 
 # Configure display options
 pd.options.display.float_format = "{:,.2f}".format
@@ -19,6 +30,8 @@ pd.options.mode.chained_assignment = None
 
 
 CLEAN_REGEX = re.compile(r"[\W_-]+")
+# RE2 form of CLEAN_REGEX for Arrow kernels, Python's \w is exactly letters and numbers plus "_"
+ARROW_CLEAN_REGEX = r"[^\p{L}\p{N}]+"
 DEFAULT_FILL_VALUE = "UNK"
 
 # Hierarchy for S3 bucket path
@@ -32,15 +45,32 @@ def clean_column_values(value: str) -> str:
     return CLEAN_REGEX.sub(" ", value).strip().lower()
 
 
+def clean_category_values(values: pd.Series) -> pd.Series:
+    """Clean a string column by cleaning its distinct values once and remapping the codes."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object)
+
+    # Non string values (numbers, booleans) behave like `clean_column_values` and become UNK
+    is_str = uniques.map(lambda value: isinstance(value, str)).astype(bool)
+    cleaned = pd.Series(DEFAULT_FILL_VALUE, index=uniques.index, dtype=object)
+    cleaned[is_str] = (
+        uniques[is_str].str.replace(CLEAN_REGEX, " ", regex=True).str.strip().str.lower()
+    )
+
+    # Missing values are factorized to -1, append a trailing UNK slot for them
+    lookup = np.append(cleaned.to_numpy(dtype=object), DEFAULT_FILL_VALUE)
+    return pd.Series(lookup[codes], index=values.index, name=values.name, dtype=object)
+
+
 def optimize_data_types(df: pd.DataFrame) -> pd.DataFrame:
     """Optimize DataFrame memory usage by downcasting numeric types."""
     # Downcast numeric columns
     numeric_cols = df.select_dtypes(include=[np.number]).columns
     df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, downcast="integer")
 
-    # Convert string columns to category type where appropriate
-    for col in ["territory", "category", "brand", "sku"]:
-        if col in df.columns and df[col].nunique() < 1000:
+    # Dimension columns become categories, their integer codes act as surrogate keys
+    for col in DIMENSION_COLUMNS:
+        if col in df.columns:
             df[col] = df[col].astype("category")
 
     return df
@@ -60,7 +90,7 @@ def load_and_process(file_path: Path) -> pd.DataFrame:
 
         # Clean string columns
         str_cols = df.select_dtypes(include=["object", "category"]).columns
-        df[str_cols] = df[str_cols].apply(lambda x: x.map(clean_column_values))
+        df[str_cols] = df[str_cols].apply(clean_category_values)
         df[str_cols] = df[str_cols].fillna(DEFAULT_FILL_VALUE)
 
         # Handle numeric columns
@@ -76,117 +106,768 @@ def load_and_process(file_path: Path) -> pd.DataFrame:
         raise
 
 
-def latest_month_year(df: pd.DataFrame) -> Tuple[int, int]:
-    """Get latest available month and year from the data."""
-    return df.month.max(), df.year.max()
+def process_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """Project, clean and type one batch of raw rows to the fixed cache schema."""
+    df = df[list(COLUMNS_MAP.keys())].rename(columns=COLUMNS_MAP)
 
+    for col in df.columns:
+        if col in STRING_COLUMNS:
+            df[col] = clean_category_values(df[col])
+        else:
+            # Booleans become 1/0 and missing or malformed numbers become 0
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(np.int32)
 
-def upload_from_local(local_file: Path, hierarchy: dict):
-    if local_file.exists() and local_file.suffix in [".csv", ".gz", ".gzip"]:
-        local_md5 = hashlib.md5(open(local_file, "rb").read()).hexdigest()
-        remote_filename = f"{local_md5}{local_file.suffix}"
+    return df
 
-        print("Where do you want to upload the file?")
-        print("1. AWS S3")
-        print("2. Google Drive")
-        choice = input("Enter your choice (1 or 2): ").strip()
 
-        if choice == "1":
-            if not isin_s3bucket(filename=remote_filename, **hierarchy):
-                upload_file_to_s3bucket(local_file, remote_filename=remote_filename, **hierarchy)
-                logger.info(f"File uploaded to S3: {remote_filename}")
-            else:
-                logger.info(f"File already exists in S3: {remote_filename}")
+def cache_schema() -> pa.Schema:
+    """Arrow schema of the processed table, identical for every batch."""
+    return pa.schema(
+        [(col, pa.string() if col in STRING_COLUMNS else pa.int32()) for col in COLUMNS_MAP.values()]
+    )
+
+
+def write_partitions(table: pa.Table, dataset_dir: Path, part_name: str) -> None:
+    """Append a processed table to the `year=/month=` partitioned dataset."""
+    pq.write_to_dataset(
+        table,
+        root_path=dataset_dir,
+        partition_cols=PARTITION_COLUMNS,
+        basename_template=f"{part_name}-{{i}}.parquet",
+        compression="snappy",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def check_columns(file_path: Path) -> None:
+    """Raise if the header of a gzip CSV lacks any `COLUMNS_MAP` column."""
+    header = pd.read_csv(file_path, compression="gzip", nrows=0).columns
+    missing_cols = [col for col in COLUMNS_MAP if col not in header]
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+
+
+def read_batches(
+    file_path: Path, batch_rows: int = STREAM_BATCH_ROWS, skip_periods: dict | None = None
+) -> Iterator[pa.Table]:
+    """Yield processed Arrow tables of at most `batch_rows` rows from a gzip CSV.
+
+    Only one batch is held in memory at a time, so peak memory is bounded by
+    `batch_rows` and not by the size of the file. Rows already cached per
+    `skip_periods` are dropped before the costly cleaning step.
+    """
+    check_columns(file_path)
+
+    schema = cache_schema()
+    reader = pd.read_csv(
+        file_path,
+        compression="gzip",
+        usecols=list(COLUMNS_MAP.keys()),
+        dtype={col: str for col in COLUMNS_MAP if COLUMNS_MAP[col] in STRING_COLUMNS},
+        chunksize=batch_rows,
+    )
+    with reader:
+        for batch in reader:
+            if skip_periods:
+                keys = pd.to_numeric(batch["year"], errors="coerce") * 100 + pd.to_numeric(batch["month"], errors="coerce")
+                partitions = clean_category_values(batch[source_column(SOURCE_PARTITION_COLUMN)])
+                cached = cached_rows(pa.array(keys, from_pandas=True), pa.array(partitions, pa.string()), skip_periods)
+                batch = batch[~cached.to_numpy(zero_copy_only=False)]
+            if len(batch):
+                yield pa.Table.from_pandas(process_batch(batch), schema=schema, preserve_index=False)
+
+
+def csv_convert_options() -> pv.ConvertOptions:
+    """Parse only the `COLUMNS_MAP` columns, straight into their declared types.
+
+    Text columns are strings with empty fields as nulls, flag columns booleans
+    and the other numeric columns float64, which also accepts "12.0" and
+    missing values.
+    """
+    column_types = {}
+    for source_col, col in COLUMNS_MAP.items():
+        if col in STRING_COLUMNS:
+            column_types[source_col] = pa.string()
+        elif col in FLAG_COLUMNS:
+            column_types[source_col] = pa.bool_()
+        else:
+            column_types[source_col] = pa.float64()
+    return pv.ConvertOptions(
+        include_columns=list(COLUMNS_MAP.keys()), column_types=column_types, strings_can_be_null=True
+    )
+
+
+def clean_arrow_strings(values: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Arrow counterpart of `clean_category_values`, cleaning each distinct value once."""
+    encoded = pc.dictionary_encode(values.combine_chunks())
+    cleaned = pc.utf8_lower(
+        pc.utf8_trim_whitespace(pc.replace_substring_regex(encoded.dictionary, ARROW_CLEAN_REGEX, " "))
+    )
+    return pa.chunked_array([pc.fill_null(cleaned.take(encoded.indices), DEFAULT_FILL_VALUE)])
+
+
+def process_arrow_batch(table: pa.Table) -> pa.Table:
+    """Rename, clean and cast a parsed table to `cache_schema`."""
+    columns = []
+    for source_col, col in COLUMNS_MAP.items():
+        values = table[source_col]
+        if col in STRING_COLUMNS:
+            columns.append(clean_arrow_strings(values))
+        else:
+            # Flags become 1/0, fractions are truncated and missing numbers become 0
+            columns.append(pc.fill_null(pc.cast(values, pa.int32(), safe=False), 0))
+    return pa.Table.from_arrays(columns, schema=cache_schema())
+
+
+def read_arrow_batches(
+    file_path: Path, batch_rows: int = STREAM_BATCH_ROWS, skip_periods: dict | None = None
+) -> Iterator[pa.Table]:
+    """`read_batches` with the multi-threaded pyarrow.csv parser.
+
+    Types are fixed at parse time from `csv_convert_options`, so there is no
+    type inference and no extra conversion pass over the raw text. A value
+    that does not parse as its declared type raises `pa.ArrowInvalid`.
+    """
+    check_columns(file_path)
+
+    reader = pv.open_csv(
+        file_path,
+        read_options=pv.ReadOptions(use_threads=True),
+        convert_options=csv_convert_options(),
+    )
+    pending, pending_rows = [], 0
+    for batch in reader:
+        if skip_periods:
+            keys = pc.add(pc.multiply(batch["year"], 100), batch["month"])
+            partitions = clean_arrow_strings(pa.chunked_array([batch[source_column(SOURCE_PARTITION_COLUMN)]]))
+            batch = batch.filter(pc.invert(cached_rows(keys, partitions.combine_chunks(), skip_periods)))
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= batch_rows:
+            yield process_arrow_batch(pa.Table.from_batches(pending))
+            pending, pending_rows = [], 0
+    if pending_rows:
+        yield process_arrow_batch(pa.Table.from_batches(pending))
+
+
+def source_batches(
+    file_path: Path, skip_periods: dict | None = None, csv_reader: str = CSV_READER
+) -> Iterator[pa.Table]:
+    """Processed tables of a source file, streamed or in one piece per `STREAMING_INGEST`."""
+    if STREAMING_INGEST and csv_reader == "arrow":
+        yield from read_arrow_batches(file_path, skip_periods=skip_periods)
+    elif STREAMING_INGEST:
+        yield from read_batches(file_path, skip_periods=skip_periods)
+    else:
+        yield pa.Table.from_pandas(load_and_process(file_path), preserve_index=False).cast(cache_schema())
+
+
+def source_column(col: str) -> str:
+    """Name of an output column in the source files."""
+    return next(source_col for source_col, output_col in COLUMNS_MAP.items() if output_col == col)
+
+
+def period_keys(table: pa.Table) -> pa.Array:
+    """Encode the year and month of every row as a single yyyymm integer."""
+    return pc.add(pc.multiply(table["year"], 100), table["month"])
+
+
+def cached_rows(keys: pa.Array, partitions: pa.Array, skip_periods: dict) -> pa.Array:
+    """Mask of the rows whose yyyymm key and `SOURCE_PARTITION_COLUMN` value are already cached."""
+    cached = pa.array(np.zeros(len(keys), dtype=bool))
+    for key in pc.unique(keys).drop_null().to_pylist():
+        values = skip_periods.get(divmod(int(key), 100))
+        if values:
+            rows = pc.and_(pc.equal(keys, key), pc.is_in(partitions, value_set=pa.array(sorted(values), pa.string())))
+            cached = pc.or_(cached, pc.fill_null(rows, False))
+    return cached
+
+
+def new_period_batches(
+    batches: Iterator[pa.Table], skip_periods: dict, seen_periods: set
+) -> Iterator[pa.Table]:
+    """Drop rows already cached per `skip_periods` and record the (year, month, partition) triples kept."""
+    key_columns = ["year", "month", SOURCE_PARTITION_COLUMN]
+    for table in batches:
+        if skip_periods:
+            partitions = table[SOURCE_PARTITION_COLUMN].combine_chunks()
+            table = table.filter(pc.invert(cached_rows(period_keys(table).combine_chunks(), partitions, skip_periods)))
+        if table.num_rows:
+            kept = table.select(key_columns).group_by(key_columns).aggregate([])
+            seen_periods.update(zip(*kept.to_pydict().values()))
+            yield table
+
+
+def append_to_dataset(batches: Iterator[pa.Table], dataset_dir: Path, part_prefix: str) -> int:
+    """Append processed batches as new files of the partitioned Parquet dataset.
 
-        elif choice == "2":
-            success = upload_file_to_gdrive(local_file)
-            if success:
-                logger.info(f"File uploaded to Google Drive: {local_file.name}")
+    The files are written to a staging directory first and moved into place
+    once all are complete, so readers never see a half written file. The moves
+    are one file at a time, a reader during them can see part of the drop.
+    """
+    partial_dir = dataset_dir.with_suffix(".partial")
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    total_rows = 0
+
+    try:
+        for batch_no, table in enumerate(batches):
+            write_partitions(table, partial_dir, f"{part_prefix}-{batch_no:05d}")
+            total_rows += table.num_rows
+            logger.info(f"Streamed {total_rows:,} rows into {dataset_dir.name}")
+
+        for part_file in partial_dir.rglob("*.parquet"):
+            target = dataset_dir.joinpath(part_file.relative_to(partial_dir))
+            target.parent.mkdir(parents=True, exist_ok=True)
+            part_file.replace(target)
+        return total_rows
+
+    finally:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+
+
+def table_ddl(table_name: str) -> str:
+    """DuckDB CREATE TABLE statement matching `cache_schema`."""
+    columns = ", ".join(
+        f'"{field.name}" {"VARCHAR" if pa.types.is_string(field.type) else "INTEGER"}'
+        for field in cache_schema()
+    )
+    return f"CREATE TABLE {table_name} ({columns})"
+
+
+def quote_columns(columns: list[str], prefix: str = "") -> str:
+    """Comma separated, double quoted column list for DuckDB SQL."""
+    return ", ".join(f'{prefix}"{col}"' for col in columns)
+
+
+def star_schema_ddl(catalog: str) -> list[str]:
+    """DDL of the star schema behind `llm_df` in a DuckDB store.
+
+    Every `DIMENSIONS` entry becomes a `dim_<name>` table with an integer
+    surrogate key. `fact_sales` holds month, year, the keys and the measures,
+    and the `llm_df` view joins them back to the flat table the prompts use.
+    """
+    measures = [col for col in COLUMNS_MAP.values() if col not in DIMENSION_COLUMNS]
+    statements = []
+    for dim, columns in DIMENSIONS.items():
+        column_defs = ", ".join(f'"{col}" VARCHAR' for col in columns)
+        statements.append(f"CREATE TABLE IF NOT EXISTS {catalog}.dim_{dim} ({dim}_id INTEGER, {column_defs})")
+
+    key_defs = ", ".join(f"{dim}_id INTEGER" for dim in DIMENSIONS)
+    measure_defs = ", ".join(f'"{col}" INTEGER' for col in measures)
+    statements.append(f"CREATE TABLE IF NOT EXISTS {catalog}.fact_sales ({key_defs}, {measure_defs})")
+
+    # The view binds its tables in the database it lives in, so it stays unqualified
+    joins = " ".join(f"JOIN dim_{dim} USING ({dim}_id)" for dim in DIMENSIONS)
+    statements.append(
+        f"CREATE OR REPLACE VIEW {catalog}.llm_df AS "
+        f"SELECT {quote_columns(list(COLUMNS_MAP.values()))} FROM fact_sales {joins}"
+    )
+    return statements
+
+
+def append_star_schema(conn: duckdb.DuckDBPyConnection, catalog: str, staging: str) -> None:
+    """Append a staged flat table to the star schema of a DuckDB store.
+
+    Unseen dimension members get the next surrogate keys. Fact rows are
+    inserted ordered by year and month so zonemaps can skip row groups.
+    """
+    for statement in star_schema_ddl(catalog):
+        conn.execute(statement)
+
+    for dim, columns in DIMENSIONS.items():
+        conn.execute(
+            f"INSERT INTO {catalog}.dim_{dim} "
+            f"SELECT (SELECT coalesce(max({dim}_id), 0) FROM {catalog}.dim_{dim}) + row_number() OVER (), * "
+            f"FROM (SELECT DISTINCT {quote_columns(columns)} FROM {staging} "
+            f"EXCEPT SELECT {quote_columns(columns)} FROM {catalog}.dim_{dim})"
+        )
+
+    measures = [col for col in COLUMNS_MAP.values() if col not in DIMENSION_COLUMNS]
+    keys = ", ".join(f"{dim}_id" for dim in DIMENSIONS)
+    joins = " ".join(
+        f"JOIN {catalog}.dim_{dim} USING ({quote_columns(columns)})" for dim, columns in DIMENSIONS.items()
+    )
+    conn.execute(
+        f"INSERT INTO {catalog}.fact_sales "
+        f"SELECT {keys}, {quote_columns(measures)} FROM {staging} {joins} ORDER BY year, month"
+    )
+
+
+def append_to_duckdb(batches: Iterator[pa.Table], db_file: Path) -> int:
+    """Append processed batches to a persistent DuckDB database file.
+
+    Batches are staged in a scratch database and then split into dimension
+    and fact rows by `append_star_schema`, or inserted into a flat `llm_df`
+    ordered by year and month when `DUCKDB_STAR_SCHEMA` is off. The new rows
+    are also aggregated into the hierarchy rollups when `ROLLUPS_ENABLED`.
+    The sort spills to disk past `INGEST_MEMORY_LIMIT`, which keeps peak
+    memory bounded. The append runs on a copy of the database that replaces
+    it at the end, so read-only connections keep working during the ingest.
+    """
+    partial_file = db_file.with_suffix(".partial")
+    staging_file = db_file.with_suffix(".staging")
+    for stale in (partial_file, staging_file):
+        stale.unlink(missing_ok=True)
+    if db_file.exists():
+        shutil.copyfile(db_file, partial_file)
+    total_rows = 0
+
+    try:
+        with duckdb.connect(staging_file.as_posix()) as conn:
+            conn.execute(f"SET memory_limit = '{INGEST_MEMORY_LIMIT}'")
+            conn.execute(table_ddl("staging"))
+            for table in batches:
+                conn.register("batch", table)
+                conn.execute("INSERT INTO staging SELECT * FROM batch")
+                conn.unregister("batch")
+                total_rows += table.num_rows
+                logger.info(f"Streamed {total_rows:,} rows into {db_file.name}")
+
+            store_file = partial_file.as_posix().replace("'", "''")
+            conn.execute(f"ATTACH '{store_file}' AS store")
+            if DUCKDB_STAR_SCHEMA:
+                append_star_schema(conn, "store", "staging")
             else:
-                logger.error("Failed to upload file to Google Drive")
+                conn.execute(table_ddl("IF NOT EXISTS store.llm_df"))
+                conn.execute("INSERT INTO store.llm_df SELECT * FROM staging ORDER BY year, month")
+            if ROLLUPS_ENABLED:
+                append_rollups(conn, "store", "staging")
+            conn.execute("DETACH store")
 
-        else:
-            logger.warning("Invalid choice. Upload canceled.")
+        partial_file.replace(db_file)
+        return total_rows
 
+    except Exception as e:
+        partial_file.unlink(missing_ok=True)
+        logger.error(f"DuckDB ingest failed: {str(e)}")
+        raise
 
-def enforce_single_file(dir_path: Path):
-    files = [file for file in dir_path.iterdir() if file.is_file()]  # List all files
-    if len(files) > 1:
-        latest = max(files, key=lambda x: x.stat().st_ctime)  # Get latest file
-        for file in files:
-            if file != latest:
-                file.unlink()  # Delete old files
-                logger.info(f"Deleted old file: {file}")
+    finally:
+        staging_file.unlink(missing_ok=True)
+        staging_file.with_suffix(".staging.wal").unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=1)
+def processing_fingerprint() -> str:
+    """Fingerprint of everything that shapes the cached table.
+
+    Covers the source of the processing functions, `COLUMNS_MAP`, the column
+    typing and the cleaning rules, so any change to them yields a new cache key.
+    """
+    processing_code = [
+        clean_column_values, clean_category_values, load_and_process,
+        process_batch, cache_schema, read_batches, source_batches, table_ddl,
+        csv_convert_options, clean_arrow_strings, process_arrow_batch, read_arrow_batches,
+        star_schema_ddl, append_star_schema, rollup_measures, rollup_ddl, append_rollups,
+    ]
+    digest = hashlib.sha256()
+    for func in processing_code:
+        digest.update(inspect.getsource(func).encode())
+    settings = {
+        "version": PROCESSING_VERSION,
+        "columns": COLUMNS_MAP,
+        "string_columns": STRING_COLUMNS,
+        "flag_columns": FLAG_COLUMNS,
+        "dimensions": DIMENSIONS,
+        "star_schema": DUCKDB_STAR_SCHEMA,
+        "rollups": ROLLUPS_ENABLED,
+        "clean_regex": CLEAN_REGEX.pattern,
+        "fill_value": DEFAULT_FILL_VALUE,
+        "cache_format": CACHE_FORMAT,
+        "streaming": STREAMING_INGEST,
+        "csv_reader": CSV_READER,
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def append_to_arrow(batches: Iterator[pa.Table], ipc_file: Path) -> int:
+    """Append processed batches to an uncompressed Arrow IPC file.
+
+    The IPC file format cannot be appended in place, so the existing batches
+    are copied from the memory map into a new file that replaces the old one.
+    Processes still mapping the old file keep reading it until they reload.
+    """
+    partial_file = ipc_file.with_suffix(".partial")
+    total_rows = 0
 
+    try:
+        with pa.OSFile(partial_file.as_posix(), "wb") as sink, pa.ipc.new_file(sink, cache_schema()) as writer:
+            if ipc_file.exists():
+                writer.write_table(load_ipc_table(ipc_file))
+            for table in batches:
+                writer.write_table(table, max_chunksize=STREAM_BATCH_ROWS)
+                total_rows += table.num_rows
+                logger.info(f"Streamed {total_rows:,} rows into {ipc_file.name}")
 
-def latest_file(path: Path, pattern: str = "*"):
-    files = path.glob(pattern)
-    return max(files, key=lambda x: x.stat().st_ctime, default=None)
+        partial_file.replace(ipc_file)
+        return total_rows
 
+    except Exception as e:
+        partial_file.unlink(missing_ok=True)
+        logger.error(f"Arrow IPC ingest failed: {str(e)}")
+        raise
 
-@st.cache_data(show_spinner=False)
-@time_checker
-def data_loader() -> pd.DataFrame:
-    """Load data with caching mechanism using PyArrow format."""
-    DATA_FILE = None
 
-    # Step 1: Check cached directory first
-    cached_latest = latest_file(CACHED_PATH)
-    if cached_latest:
-        DATA_FILE = cached_latest
-        logger.info(f"Cached file exists: {DATA_FILE}")
+def load_ipc_table(ipc_file: Path) -> pa.Table:
+    """Memory-map an Arrow IPC cache file.
+
+    Nothing is decoded or copied, the buffers point into the OS page cache and
+    are shared by every process that maps the same file.
+    """
+    with pa.memory_map(ipc_file.as_posix(), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def cache_location() -> Path:
+    """Path of the cache keyed by the current processing fingerprint."""
+    return CACHED_PATH.joinpath(f"{CACHE_NAME}-{processing_fingerprint()}{CACHE_SUFFIXES[CACHE_FORMAT]}")
+
+
+def manifest_path() -> Path:
+    """Manifest of the cache keyed by the current processing fingerprint."""
+    return CACHED_PATH.joinpath(f"manifest-{processing_fingerprint()}.json")
+
+
+def load_manifest() -> dict:
+    """Read the ingest manifest, which records what every source file contributed."""
+    if manifest_path().exists():
+        return json.loads(manifest_path().read_text())
+    return {"sources": {}}
+
+
+def save_manifest(manifest: dict) -> None:
+    """Write the ingest manifest atomically."""
+    partial_file = manifest_path().with_suffix(".partial")
+    partial_file.write_text(json.dumps(manifest, indent=2))
+    partial_file.replace(manifest_path())
+
+
+def stats_path() -> Path:
+    """Statistics sidecar of the cache keyed by the current processing fingerprint."""
+    return CACHED_PATH.joinpath(f"stats-{processing_fingerprint()}.json")
+
+
+def compute_stats(data: Path) -> dict:
+    """Scan a cache once for its periods, rows per month and per-column distinct counts and ranges."""
+    is_store = data.suffix == DUCKDB_SUFFIX
+    with duckdb.connect(data.as_posix() if is_store else ":memory:", read_only=is_store) as conn:
+        if data.suffix == ARROW_SUFFIX:
+            conn.register("llm_df", load_ipc_table(data))
+        elif not is_store:
+            parquet_glob = data.joinpath("**", "*.parquet").as_posix().replace("'", "''")
+            conn.execute(
+                f"CREATE VIEW llm_df AS SELECT * REPLACE (CAST(year AS INTEGER) AS year, CAST(month AS INTEGER) AS month) "
+                f"FROM read_parquet('{parquet_glob}', hive_partitioning = true)"
+            )
+
+        periods = conn.execute(
+            "SELECT year, month, COUNT(*) FROM llm_df GROUP BY year, month ORDER BY year, month"
+        ).fetchall()
+        columns = list(COLUMNS_MAP.values())
+        aggregates = ", ".join(
+            f'COUNT(DISTINCT "{col}"), MIN("{col}"), MAX("{col}")' for col in columns
+        )
+        values = conn.execute(f"SELECT {aggregates} FROM llm_df").fetchone()
+
+    return {
+        "fingerprint": processing_fingerprint(),
+        "rows": sum(rows for _, _, rows in periods),
+        "periods": [{"year": year, "month": month, "rows": rows} for year, month, rows in periods],
+        "columns": {
+            col: dict(zip(("distinct", "min", "max"), values[3 * i : 3 * i + 3]))
+            for i, col in enumerate(columns)
+        },
+    }
+
+
+def save_stats(stats: dict) -> None:
+    """Write the statistics sidecar atomically."""
+    partial_file = stats_path().with_suffix(".partial")
+    partial_file.write_text(json.dumps(stats, indent=2))
+    partial_file.replace(stats_path())
+
+
+def load_stats() -> dict | None:
+    """Read the statistics sidecar of the current cache, if it was built."""
+    if stats_path().exists():
+        return json.loads(stats_path().read_text())
+    return None
+
+
+def remove_stale_caches() -> None:
+    """Delete caches, manifests and statistics built under an older processing fingerprint."""
+    current = {cache_location().name, manifest_path().name, stats_path().name}
+    stale_files = [*CACHED_PATH.glob(f"{CACHE_NAME}-*"), *CACHED_PATH.glob("manifest-*.json"), *CACHED_PATH.glob("stats-*.json")]
+    for path in stale_files:
+        if path.name in current:
+            continue
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+        logger.info(f"Deleted stale cache: {path.name}")
 
-    # Step 2: Check from the download directory
-    elif download_latest := latest_file(DOWNLOADS_PATH):
-        DATA_FILE = download_latest
-        logger.info(f"File exists in Download directory: {DATA_FILE}")
 
-    # Step 3: If no file in download, check S3 and download it
-    else:
-        print("No file found locally. Choose source to download:")
-        print("1. AWS S3")
-        print("2. Google Drive")
-        choice = input("Enter your choice (1 or 2): ").strip()
-
-        if choice == "1":
-            downloaded_file = download_file_from_s3bucket(**hierarchy)
-            if downloaded_file:
-                DATA_FILE = downloaded_file
-                logger.info(f"File downloaded from S3: {DATA_FILE}")
-
-        elif choice == "2":
-            try:
-                downloaded_file = get_latest_file(folder_key=FOLDER_KEY, download_path=DOWNLOADS_PATH.as_posix())
-                if downloaded_file:
-                    DATA_FILE = Path(downloaded_file)
-                    logger.info(f"File downloaded from Google Drive: {DATA_FILE}")
-            except Exception as e:
-                logger.error(f"Google Drive download failed: {e}")
-
-    # Step 4: If file not in S3, check upload directory and upload it
-    if DATA_FILE is None:
-        upload_latest = latest_file(UPLOADS_PATH)
-        if upload_latest:
-            upload_from_local(upload_latest)  # Upload to S3
-            DATA_FILE = latest_file(DOWNLOADS_PATH)  # Get the latest downloaded file
-            logger.info(f"File uploaded from Upload directory: {DATA_FILE}")
-
-    # Step 5: Processed if the data file
-    if DATA_FILE:
-        if DATA_FILE.suffix == ".arrow":
-            logger.info("Loading cached data from Parquet")
-            return pd.read_parquet(DATA_FILE)
-        elif DATA_FILE.suffix == ".gz":
-            logger.info("Processing and caching new data")
-            df = load_and_process(DATA_FILE)
-            cache_filename = CACHED_PATH.joinpath(f"{DATA_FILE.stem}.arrow")
-            df.to_parquet(cache_filename, compression="snappy")
-            return df
-    else:
-        # Step 6: If still no file, raise an error
-        raise FileNotFoundError("No valid file found in any directory!")
+def cached_periods(manifest: dict) -> dict:
+    """`SOURCE_PARTITION_COLUMN` values already present in the cache per (year, month) pair."""
+    periods: dict = {}
+    for source in manifest["sources"].values():
+        for year, month, partition in source["periods"]:
+            periods.setdefault((year, month), set()).add(partition)
+    return periods
+
+
+def process_source(file_path: Path, staging_file: Path, skip_periods: dict) -> Tuple[int, list]:
+    """Pool worker: run the processing pipeline on one source into a staging Parquet file.
+
+    A source with values the typed Arrow parser rejects is processed again
+    with the more lenient pandas reader.
+    """
+    try:
+        return stage_source(file_path, staging_file, skip_periods, CSV_READER)
+    except pa.ArrowInvalid as e:
+        if not STREAMING_INGEST or CSV_READER != "arrow":
+            raise
+        logger.warning(f"Typed CSV parse failed for {file_path.name}, using the pandas reader: {e}")
+        return stage_source(file_path, staging_file, skip_periods, "pandas")
+
+
+def stage_source(file_path: Path, staging_file: Path, skip_periods: dict, csv_reader: str) -> Tuple[int, list]:
+    """Write the processed new-period rows of one source to a staging Parquet file."""
+    new_periods: set = set()
+    rows = 0
+    batches = new_period_batches(source_batches(file_path, skip_periods, csv_reader), skip_periods, new_periods)
+    with pq.ParquetWriter(staging_file, cache_schema(), compression="snappy") as writer:
+        for table in batches:
+            writer.write_table(table)
+            rows += table.num_rows
+    logger.info(f"Processed {rows:,} rows from {file_path.name}")
+    return rows, sorted(new_periods)
+
+
+def staged_batches(staging_files: list[Path]) -> Iterator[pa.Table]:
+    """Read the staging files of the workers back in bounded batches."""
+    for staging_file in staging_files:
+        for batch in pq.ParquetFile(staging_file).iter_batches(batch_size=STREAM_BATCH_ROWS):
+            yield pa.Table.from_batches([batch])
+
+
+def drop_batches(staging_files: dict, contributed: dict) -> Iterator[pa.Table]:
+    """Read the staging files of a drop back in source order, without rows an earlier source staged.
+
+    The workers only check their source against the cache, so overlapping
+    sources of one drop, e.g. cumulative exports ingested together on a
+    rebuild, would each stage the same (year, month, partition) triples. The
+    row count and triples every source kept are recorded in `contributed`.
+    """
+    staged_periods: dict = {}
+    for source_hash, staging_file in staging_files.items():
+        kept: set = set()
+        rows = 0
+        for table in new_period_batches(staged_batches([staging_file]), staged_periods, kept):
+            rows += table.num_rows
+            yield table
+        for year, month, partition in kept:
+            staged_periods.setdefault((year, month), set()).add(partition)
+        contributed[source_hash] = (rows, sorted(kept))
+
+
+def ingest_sources(file_paths: list[Path]) -> Path:
+    """Incrementally ingest source drops into the cache, in parallel across cores.
+
+    Sources are keyed by the hash of their bytes, so a renamed or touched
+    file is recognised and an edited one is not mistaken for a known drop.
+    The manifest remembers the size, modification time and hash of every file
+    it has seen, so the poller only hashes files that are new or changed.
+    Every new source runs the processing pipeline in its own process of a
+    pool and writes a staging file. The main process then appends all staging
+    files to the cache and updates the manifest, so it stays the single writer.
+
+    Rows are skipped as already cached per (year, month) and
+    `SOURCE_PARTITION_COLUMN` value, so a regional file of a month that other
+    regions already filled still adds its own rows, whenever it arrives.
+    Sources of one call are appended in the given order, each without the
+    triples an earlier one added. Only the new rows are appended, and the
+    manifest records the triples and row count each source contributed.
+    A source that fails to process is logged and recorded as failed, so it
+    is skipped until its bytes change while the other sources are ingested.
+    """
+    cache = cache_location()
+    manifest = load_manifest() if cache.exists() else {"sources": {}}
+
+    files = manifest.setdefault("files", {})
+    new_sources, hashed = {}, False
+    for file_path in file_paths:
+        stat = file_path.stat()
+        known = files.get(file_path.name)
+        if known and (known["size"], known["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            source_hash = known["sha256"]
+        else:
+            source_hash = file_sha256(file_path)
+            files[file_path.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": source_hash}
+            hashed = True
+            if source_hash in manifest["sources"] or source_hash in new_sources:
+                logger.info(f"Source already ingested: {file_path.name}")
+        if source_hash in manifest.get("failed", {}):
+            logger.info(f"Skipping source that failed to process before: {file_path.name}")
+        elif source_hash not in manifest["sources"]:
+            new_sources.setdefault(source_hash, file_path)
+    if not new_sources:
+        if hashed and cache.exists():
+            save_manifest(manifest)
+        return cache
+
+    skip_periods = cached_periods(manifest)
+    staging_dir = cache.with_suffix(".ingest")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
 
-    # **Step 7: Cleanup old files to ensure only one file per directory**
-    enforce_single_file(CACHED_PATH)
-    enforce_single_file(DOWNLOADS_PATH)
-    enforce_single_file(UPLOADS_PATH)
+    try:
+        staging_files = {source_hash: staging_dir.joinpath(f"{source_hash}.parquet") for source_hash in new_sources}
+        workers = min(len(new_sources), INGEST_WORKERS or os.cpu_count() or 1)
+        # Forking the multi-threaded Streamlit server could copy locks held by other threads,
+        # Windows has no forkserver and spawns instead
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        pool_context = multiprocessing.get_context(start_method)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context) as pool:
+            futures = {
+                source_hash: pool.submit(process_source, file_path, staging_files[source_hash], skip_periods)
+                for source_hash, file_path in new_sources.items()
+            }
+            for source_hash, future in futures.items():
+                try:
+                    future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    # A corrupt drop is set aside until its bytes change, the others are still ingested
+                    logger.error(f"Processing {new_sources[source_hash].name} failed, skipping it: {e}")
+                    manifest.setdefault("failed", {})[source_hash] = {
+                        "name": new_sources[source_hash].name,
+                        "failed_at": datetime.now().isoformat(timespec="seconds"),
+                        "error": str(e),
+                    }
+                    del staging_files[source_hash]
+        if not staging_files:
+            if cache.exists():
+                save_manifest(manifest)
+            return cache
+
+        contributed: dict = {}
+        batches = drop_batches(staging_files, contributed)
+        if CACHE_FORMAT == "duckdb":
+            rows = append_to_duckdb(batches, cache)
+        elif CACHE_FORMAT == "arrow":
+            rows = append_to_arrow(batches, cache)
+        else:
+            rows = append_to_dataset(batches, cache, f"drop-{datetime.now():%Y%m%d%H%M%S}")
+
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    manifest["fingerprint"] = processing_fingerprint()
+    for source_hash, (source_rows, source_periods) in contributed.items():
+        if not source_rows:
+            logger.warning(f"Source {new_sources[source_hash].name} only holds rows that are already cached")
+        manifest["sources"][source_hash] = {
+            "name": new_sources[source_hash].name,
+            "ingested_at": datetime.now().isoformat(timespec="seconds"),
+            "rows": source_rows,
+            "periods": source_periods,
+        }
+    save_manifest(manifest)
+    save_stats(compute_stats(cache))
+    logger.info(f"Ingested {rows:,} rows from {len(contributed)} sources with {workers} workers")
+    return cache
+
+
+def ingest_source(file_path: Path) -> Path:
+    """Incrementally ingest a single source drop into the cache."""
+    return ingest_sources([file_path])
+
+
+def file_sha256(file_path: Path) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dataset_periods(data: Path) -> list[Tuple[int, int]]:
+    """List the (year, month) pairs of a cached dataset.
+
+    Parquet datasets are read from their partition directory names alone, DuckDB
+    stores with a DISTINCT over the year/month columns of the fact table.
+    """
+    if data.suffix == DUCKDB_SUFFIX:
+        fact_table = "fact_sales" if DUCKDB_STAR_SCHEMA else "llm_df"
+        with duckdb.connect(data.as_posix(), read_only=True) as conn:
+            return sorted(conn.execute(f"SELECT DISTINCT year, month FROM {fact_table}").fetchall())
+
+    periods = []
+    for month_dir in data.glob("year=*/month=*"):
+        year = int(month_dir.parent.name.split("=", 1)[1])
+        month = int(month_dir.name.split("=", 1)[1])
+        periods.append((year, month))
+    return sorted(periods)
+
+
+def load_arrow_table(data: Path) -> pa.Table:
+    """Load a cache as one in-memory Arrow table that DuckDB can scan without copying.
+
+    Arrow IPC caches are memory-mapped. The other formats are read through
+    DuckDB so the table comes back in large chunks; the many small Parquet
+    fragments would otherwise make every scan of the table slow.
+    """
+    if data.suffix == ARROW_SUFFIX:
+        return load_ipc_table(data)
+    if data.suffix == DUCKDB_SUFFIX:
+        with duckdb.connect(data.as_posix(), read_only=True) as conn:
+            return dictionary_encode_dimensions(conn.execute("SELECT * FROM llm_df").fetch_arrow_table())
+
+    parquet_glob = data.joinpath("**", "*.parquet").as_posix().replace("'", "''")
+    with duckdb.connect() as conn:
+        return dictionary_encode_dimensions(
+            conn.execute(
+                f"SELECT * REPLACE (CAST(year AS INTEGER) AS year, CAST(month AS INTEGER) AS month) "
+                f"FROM read_parquet('{parquet_glob}', hive_partitioning = true)"
+            ).fetch_arrow_table()
+        )
+
+
+def dictionary_encode_dimensions(table: pa.Table) -> pa.Table:
+    """Store dimension columns as integer indices into a dictionary of distinct values."""
+    for col in DIMENSION_COLUMNS:
+        idx = table.schema.get_field_index(col)
+        table = table.set_column(idx, col, pc.dictionary_encode(table[col]))
+    return table
+
+
+def available_years_months(data) -> Tuple[list, list]:
+    """Distinct years and months of the dataset.
+
+    Read from the statistics sidecar when the cache has one, so UI reruns never
+    scan the data; otherwise from the partitions or the frame.
+    """
+    if stats := load_stats():
+        return (
+            sorted({period["year"] for period in stats["periods"]}),
+            sorted({period["month"] for period in stats["periods"]}),
+        )
+    if isinstance(data, Path) and data.suffix == ARROW_SUFFIX:
+        data = load_ipc_table(data)
+    if isinstance(data, Path):
+        periods = dataset_periods(data)
+        return sorted({year for year, _ in periods}), sorted({month for _, month in periods})
+    if isinstance(data, pa.Table):
+        return sorted(pc.unique(data["year"]).to_pylist()), sorted(pc.unique(data["month"]).to_pylist())
+    return sorted(data.year.unique().tolist()), sorted(data.month.unique().tolist())
+
+
+def latest_month_year(data) -> Tuple[int, int]:
+    """Get latest available month and year from the data."""
+    years, months = available_years_months(data)
+    return max(months), max(years)
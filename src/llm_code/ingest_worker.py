@@ -0,0 +1,131 @@
+import json
+import hashlib
+import threading
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from pathlib import Path
+from typing import Tuple
+
+from src.connector_aws_gdrive.aws_funcs import download_file_from_s3bucket
+from src.connector_aws_gdrive.gdrive_funcs import get_latest_file
+from src.constants import *
+from src.utils.logging import logger
+from .data_processor_and_loader import (
+    hierarchy, cache_location, load_manifest, remove_stale_caches, ingest_sources,
+    load_arrow_table, stats_path, save_stats, compute_stats,
+)
+
+# The dataset every session reads and its version. The worker replaces the
+# whole tuple in one assignment, so readers see either the old or the new one
+_active: Tuple[Path | pa.Table | pd.DataFrame | None, str | None] = (None, None)
+
+
+def active_dataset() -> Tuple[Path | pa.Table | pd.DataFrame | None, str | None]:
+    """The published dataset and its version, (None, None) before the first publish."""
+    return _active
+
+
+def publish_dataset(dataset: Path | pa.Table | pd.DataFrame, version: str) -> None:
+    """Atomically point every new session at a complete dataset."""
+    global _active
+    _active = (dataset, version)
+    logger.info(f"Published dataset version {version}")
+
+
+def cache_version() -> str | None:
+    """Version of the current cache, derived from its name and the sources it holds."""
+    if not cache_location().exists():
+        return None
+    sources = sorted(load_manifest()["sources"])
+    key = json.dumps([cache_location().name, sources]).encode()
+    return hashlib.sha256(key).hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def open_dataset(cache: Path) -> Path | pa.Table:
+    """What sessions query: the cache path, or the cache loaded as an Arrow table."""
+    if CACHE_FORMAT == "arrow" or DATASET_BACKEND == "arrow":
+        logger.info("Loading cached data as an Arrow table")
+        return load_arrow_table(cache)
+    return cache
+
+
+def fetch_remote_source() -> None:
+    """Download the newest drop of `INGEST_SOURCE` into `DOWNLOADS_PATH`."""
+    if INGEST_SOURCE == "s3":
+        if downloaded_file := download_file_from_s3bucket(**hierarchy):
+            logger.info(f"File downloaded from S3: {downloaded_file}")
+    elif INGEST_SOURCE == "gdrive":
+        if downloaded_file := get_latest_file(folder_key=FOLDER_KEY, download_path=DOWNLOADS_PATH.as_posix()):
+            logger.info(f"File downloaded from Google Drive: {downloaded_file}")
+
+
+def refresh_dataset() -> bool:
+    """Ingest new drops off the request path and publish the cache once it changed.
+
+    DuckDB and Arrow caches are written to a side file and renamed into place,
+    so sessions never read a half written cache. Parquet drops are staged and
+    moved in file by file: no file is read half written, but sessions query the
+    live directory, so a query running during the move may see part of a drop.
+    Returns whether a new version was published.
+    """
+    remove_stale_caches()
+    try:
+        fetch_remote_source()
+    except Exception as e:
+        logger.error(f"Fetching from {INGEST_SOURCE} failed: {e}")
+    if sources := sorted(DOWNLOADS_PATH.glob("*.gz")):
+        ingest_sources(sources)
+
+    version = cache_version()
+    if version is None:
+        # Legacy single file caches of older releases are served until a drop arrives
+        legacy_cache = max(CACHED_PATH.glob("*.arrow"), key=lambda file: file.stat().st_ctime, default=None)
+        if legacy_cache is None or active_dataset()[1] == legacy_cache.name:
+            return False
+        publish_dataset(pd.read_parquet(legacy_cache), legacy_cache.name)
+        return True
+
+    if not stats_path().exists():
+        save_stats(compute_stats(cache_location()))
+    if version == active_dataset()[1]:
+        return False
+    publish_dataset(open_dataset(cache_location()), version)
+    return True
+
+
+def ingest_worker(stop: threading.Event) -> None:
+    """Refresh the dataset every `INGEST_POLL_SECONDS` until `stop` is set."""
+    while not stop.is_set():
+        try:
+            refresh_dataset()
+        except Exception as e:
+            logger.error(f"Background ingest failed: {e}")
+        stop.wait(INGEST_POLL_SECONDS)
+
+
+@st.cache_resource(show_spinner=False)
+def start_ingest_worker() -> threading.Event:
+    """Start the ingest worker once per server, returning the event that stops it.
+
+    An existing cache is published right away, so sessions can query it while
+    the worker ingests new drops in the background.
+    """
+    if (version := cache_version()) is not None:
+        publish_dataset(open_dataset(cache_location()), version)
+
+    stop = threading.Event()
+    threading.Thread(target=ingest_worker, args=(stop,), name="ingest-worker", daemon=True).start()
+    return stop
+
+
+def data_loader() -> Path | pa.Table | pd.DataFrame | None:
+    """The dataset sessions should query, without ever waiting on an ingest.
+
+    Returns the published DuckDB database file or partitioned Parquet directory,
+    which `execute_sql` queries in place, or an Arrow table when the cache is
+    Arrow IPC or `DATASET_BACKEND = "arrow"`. Returns None while the very first
+    cache is still being built.
+    """
+    start_ingest_worker()
+    return active_dataset()[0]
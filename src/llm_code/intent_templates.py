@@ -0,0 +1,222 @@
+import re
+import string
+from typing import Optional
+
+from src.constants import *
+from src.utils.logging import logger
+
+# Flag measures: (pattern, flag column, negated), the negated spellings are
+# checked first since they contain the plain ones
+FLAG_PATTERNS = [
+    (r"\b(unproductive|unproductivity|nonproductive)\b", "productivity", True),
+    (r"\b(productive|productivity)\b", "productivity", False),
+    (r"\b(unassorted|unassortment|nonassorted)\b", "assortment", True),
+    (r"\b(assorted|assortments?)\b", "assortment", False),
+    (r"\b(not ?stock ?outs?|no ?stock ?outs?)\b", "stockout", True),
+    (r"\bstock ?outs?\b", "stockout", False),
+]
+# Output names of the shops with the flag set and unset, as in the prompt examples
+FLAG_NAMES = {
+    "productivity": ("productive", "un_productive"),
+    "assortment": ("assorted", "un_assorted"),
+    "stockout": ("stockout", "not_stockout"),
+}
+GROWTH_PATTERN = r"\b(growth|grow|grew|growing|grown|expansion|expanded|expanding)\b"
+
+# "highest" and "lowest" words order by the value itself, "best" and "worst"
+# by how good it is, which for stockouts and unproductive or unassorted shops
+# is the opposite
+HIGH_WORDS = {"top", "highest", "most", "maximum", "max", "largest", "biggest", "greatest", "leading"}
+LOW_WORDS = {"lowest", "least", "minimum", "min", "bottom", "smallest", "weakest"}
+BEST_WORDS = {"best"}
+WORST_WORDS = {"worst", "poorest"}
+
+# Words that carry no meaning for the templates, any other word left over makes
+# the question go to the LLM, since it may be a filter the templates cannot express
+FILLER_WORDS = {
+    "which", "what", "who", "show", "me", "give", "list", "find", "tell", "get", "the", "a", "an",
+    "is", "are", "was", "were", "had", "has", "have", "having", "with", "in", "of", "for", "by",
+    "on", "during", "at", "from", "to", "all", "and", "did", "does", "do", "there", "their", "its",
+    "our", "us", "please", "level", "wise", "terms", "based", "percentage", "percent", "ratio",
+    "rate", "share", "shops", "total", "overall", "performing", "significant", "experienced",
+    "been", "month", "year", "value", "number", "amount", "achieved", "recorded", "that", "this",
+    "these", "those", "shown", "seen",
+}
+
+
+def clean_question(question: str) -> str:
+    """Lowercased question with hyphens dropped and other punctuation turned into spaces."""
+    question = question.lower().replace("-", "")
+    return question.translate(str.maketrans(string.punctuation, " " * len(string.punctuation)))
+
+
+def question_months(question: str) -> list[int]:
+    """Month numbers a question refers to: month names and abbreviations, and
+    numbers or ordinals up to 12 next to the word "month".
+    """
+    words = question.lower().translate(str.maketrans("", "", string.punctuation)).split()
+    month_terms = MONTH_NAMES + MONTH_ABBREVIATIONS
+    months = []
+    for i, word in enumerate(words):
+        if word in month_terms:
+            months.append(month_terms.index(word) % 12 + 1)
+            continue
+        next_to_month = (i > 0 and words[i - 1] == "month") or (i < len(words) - 1 and words[i + 1] == "month")
+        number = word
+        for suffix in ORDINAL_SUFFIXES:
+            if word.endswith(suffix):
+                number = word[:-len(suffix)]
+        if number.isdigit() and 1 <= int(number) <= 12 and next_to_month:
+            months.append(int(number))
+    return months
+
+
+def take(pattern: str, text: str) -> tuple[Optional[re.Match], str]:
+    """First match of `pattern` in `text`, and the text with every match blanked out."""
+    match = re.search(pattern, text)
+    return match, re.sub(pattern, " ", text) if match else text
+
+
+def parse_intent(question: str, latest_year) -> Optional[dict]:
+    """Intent of a ranking, growth or flag percentage question, None for any other question.
+
+    A question is only parsed when it names one month, one hierarchy level of
+    `KEYWORD_GROUPBY_MAP` and one measure, and every other word is a ranking
+    word, a count, a year or a word of `FILLER_WORDS`.
+    """
+    months = set(question_months(question))
+    if len(months) != 1:
+        return None
+    text = clean_question(question)
+
+    month_terms = "|".join(MONTH_NAMES + MONTH_ABBREVIATIONS)
+    text = re.sub(rf"\b(month \d{{1,2}}(st|nd|rd|th)?|\d{{1,2}}(st|nd|rd|th)? month|{month_terms})\b", " ", text)
+    years = set(re.findall(r"\b20\d\d\b", text))
+    if len(years) > 1:
+        return None
+    text = re.sub(r"\b20\d\d\b", " ", text)
+
+    levels = [group_by for pattern, group_by in KEYWORD_GROUPBY_MAP.items() if re.search(pattern, text)]
+    if len(levels) != 1:
+        return None
+    text = next(re.sub(pattern, " ", text) for pattern in KEYWORD_GROUPBY_MAP if re.search(pattern, text))
+
+    growth, text = take(GROWTH_PATTERN, text)
+    flags, metrics = [], []
+    for pattern, flag, negated in FLAG_PATTERNS:
+        match, text = take(pattern, text)
+        if match:
+            flags.append((flag, negated))
+    for pattern, metric in METRIC_KEYWORD_MAP.items():
+        match, text = take(pattern, text)
+        if match:
+            metrics.append(metric)
+    if len(flags) + len(metrics) > 1 or (flags and growth) or not (flags or metrics or growth):
+        return None
+
+    words = text.split()
+    numbers = [int(word) for word in words if word.isdigit()]
+    if len(numbers) > 1 or (numbers and not 1 <= numbers[0] <= RESULT_MAX_ROWS):
+        return None
+    words = [word for word in words if not word.isdigit()]
+    ranking = {
+        "high": any(word in HIGH_WORDS for word in words),
+        "low": any(word in LOW_WORDS for word in words),
+        "best": any(word in BEST_WORDS for word in words),
+        "worst": any(word in WORST_WORDS for word in words),
+    }
+    ranking_words = HIGH_WORDS | LOW_WORDS | BEST_WORDS | WORST_WORDS
+    if any(word not in FILLER_WORDS | ranking_words for word in words):
+        return None
+    if sum(ranking.values()) > 1 or (not any(ranking.values()) and not growth):
+        return None
+
+    return {
+        "kind": "flag" if flags else "growth" if growth else "ranking",
+        "group_by": levels[0],
+        "metric": metrics[0] if metrics else None if flags else "sales",
+        "flag": flags[0] if flags else None,
+        "ranking": next((name for name, found in ranking.items() if found), "high"),
+        "limit": numbers[0] if numbers else 1,
+        "month": months.pop(),
+        "year": int(years.pop()) if years else int(latest_year),
+    }
+
+
+def order_direction(ranking: str, higher_is_better: bool = True) -> str:
+    """ORDER BY direction of a ranking word for a measure."""
+    if ranking in ("best", "worst"):
+        ranking = "high" if (ranking == "best") == higher_is_better else "low"
+    return "DESC" if ranking == "high" else "ASC"
+
+
+def ranking_sql(intent: dict) -> str:
+    """Top or bottom hierarchy members by the sum of a measure in a month."""
+    metric = intent["metric"]
+    total = f"total_{metric.replace(' ', '_')}"
+    return f"""SELECT {intent['group_by']},
+  SUM("{metric}") AS {total}
+FROM llm_df
+WHERE month = {intent['month']} AND year = {intent['year']}
+GROUP BY {intent['group_by']}
+ORDER BY {total} {order_direction(intent['ranking'])}
+LIMIT {intent['limit']}"""
+
+
+def growth_sql(intent: dict) -> str:
+    """Hierarchy members ranked by the growth of a measure over the month before."""
+    metric, month, year = intent["metric"], intent["month"], intent["year"]
+    name = metric.replace(" ", "_")
+    previous_month, previous_year = (month - 1, year) if month > 1 else (12, year - 1)
+    current = f'SUM(CASE WHEN year = {year} AND month = {month} THEN "{metric}" ELSE 0 END)'
+    previous = f'SUM(CASE WHEN year = {previous_year} AND month = {previous_month} THEN "{metric}" ELSE 0 END)'
+    if previous_year == year:
+        where = f"year = {year} AND month IN ({previous_month}, {month})"
+    else:
+        where = f"(year = {year} AND month = {month}) OR (year = {previous_year} AND month = {previous_month})"
+    return f"""SELECT {intent['group_by']},
+  {current} AS {name}_current_month,
+  {previous} AS {name}_previous_month,
+  (({current} - {previous}) / NULLIF({previous}, 0)) * 100 AS {name}_growth_percentage
+FROM llm_df
+WHERE {where}
+GROUP BY {intent['group_by']}
+ORDER BY {name}_growth_percentage {order_direction(intent['ranking'])}
+LIMIT {intent['limit']}"""
+
+
+def flag_sql(intent: dict) -> str:
+    """Hierarchy members ranked by the share of their shops with a flag set or unset."""
+    flag, negated = intent["flag"]
+    set_name, unset_name = FLAG_NAMES[flag]
+    flagged = f"COUNT(DISTINCT CASE WHEN {flag} = 1 THEN customer END)"
+    unflagged = f"COUNT(DISTINCT CASE WHEN {flag} = 0 THEN customer END)"
+    # Stockouts are bad, productive and assorted shops are good
+    higher_is_better = (flag != "stockout") != negated
+    order_by = f"{unset_name if negated else set_name}_percentage"
+    return f"""SELECT {intent['group_by']},
+  {flagged} AS {set_name}_shops,
+  {unflagged} AS {unset_name}_shops,
+  COUNT(DISTINCT customer) AS total_shops,
+  ({flagged} * 100.0 / COUNT(DISTINCT customer)) AS {set_name}_percentage,
+  ({unflagged} * 100.0 / COUNT(DISTINCT customer)) AS {unset_name}_percentage
+FROM llm_df
+WHERE month = {intent['month']} AND year = {intent['year']}
+GROUP BY {intent['group_by']}
+ORDER BY {order_by} {order_direction(intent['ranking'], higher_is_better)}
+LIMIT {intent['limit']}"""
+
+
+TEMPLATES = {"ranking": ranking_sql, "growth": growth_sql, "flag": flag_sql}
+
+
+def template_sql(question: str, latest_year) -> Optional[str]:
+    """SQL answering `question` from a template, None when it needs the LLM."""
+    if not INTENT_TEMPLATES_ENABLED:
+        return None
+    intent = parse_intent(question, latest_year)
+    if intent is None:
+        return None
+    sql = TEMPLATES[intent["kind"]](intent)
+    logger.info(f"Answered from the {intent['kind']} template: {intent}")
+    return sql
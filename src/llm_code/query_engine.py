@@ -0,0 +1,350 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from pathlib import Path
+from typing import Callable, Hashable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from sqlglot import parse_one, exp
+from sqlglot.errors import SqlglotError
+
+from src.constants import *
+from src.utils.logging import logger, profile_logger
+from .ingest_worker import active_dataset
+from .query_router import route_query
+
+
+class QueryTimeout(Exception):
+    """A query ran past its deadline and was interrupted."""
+
+
+class DatasetChanged(Exception):
+    """A new dataset version was published since a result was computed, so it cannot be paged."""
+
+
+def table_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """Convert a result table like DuckDB's `fetchdf`, with DECIMAL and HUGEINT columns as floats.
+
+    Arrow would turn them into object columns of Python Decimals, which the
+    display code does not see as numeric.
+    """
+    fields = [
+        pa.field(field.name, pa.float64()) if pa.types.is_decimal(field.type) else field
+        for field in table.schema
+    ]
+    return table.cast(pa.schema(fields)).to_pandas()
+
+
+def paged_sql(sql: str, columns: int, offset: int, rows: int) -> str:
+    """`rows` rows of a query starting at row `offset`, in one fixed order.
+
+    Every output column is appended to the query's ORDER BY as a tiebreaker,
+    so consecutive pages neither overlap nor skip rows, whatever order the
+    query itself gives. A query sqlglot cannot parse is ordered by all its
+    columns.
+    """
+    try:
+        tree = parse_one(sql, read="duckdb")
+    except SqlglotError:
+        return f"SELECT * FROM ({sql}) ORDER BY ALL LIMIT {int(rows)} OFFSET {int(offset)}"
+    tree = tree.order_by(*(exp.Literal.number(i) for i in range(1, columns + 1)), append=True)
+    if tree.args.get("limit") or tree.args.get("offset"):
+        # The query's own LIMIT picks the rows, the pages are cut from them
+        return f"SELECT * FROM ({tree.sql(dialect='duckdb')}) LIMIT {int(rows)} OFFSET {int(offset)}"
+    return tree.limit(int(rows)).offset(int(offset)).sql(dialect="duckdb")
+
+
+class QueryResult:
+    """First rows of a query result as an Arrow table, with the total row count.
+
+    Only the first `RESULT_MAX_ROWS` rows are held, `page` fetches later ones
+    by running the query again with a LIMIT and OFFSET on the query profile
+    it ran on. The rows of a truncated result are in the total order of
+    `paged_sql`, so every page continues where the last one stopped. The key of the dataset version it read is kept, so pages never
+    mix rows of two versions.
+    """
+
+    def __init__(
+        self, sql: str, table: pa.Table, total_rows: int, profile: str = "main",
+        query_profile: dict | None = None, dataset_key: Hashable = None,
+    ):
+        self.sql = sql
+        self.table = table
+        self.total_rows = total_rows
+        self.profile = profile
+        # DuckDB's JSON profile of the run that produced the result, when profiling was on
+        self.query_profile = query_profile
+        self.dataset_key = dataset_key
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_rows > self.table.num_rows
+
+    def to_pandas(self) -> pd.DataFrame:
+        return table_to_pandas(self.table)
+
+    def renamed(self, names: list[str]) -> "QueryResult":
+        """The same result with its columns renamed."""
+        return QueryResult(
+            self.sql, self.table.rename_columns(names), self.total_rows, self.profile, self.query_profile, self.dataset_key
+        )
+
+    def page(self, data: Path | pa.Table | pd.DataFrame, offset: int, rows: int = RESULT_MAX_ROWS) -> pd.DataFrame:
+        """`rows` rows of the result on `data` starting at row `offset`.
+
+        Raises `DatasetChanged` when `data` is no longer the dataset version
+        the result was computed on.
+        """
+        sql = paged_sql(self.sql, self.table.num_columns, offset, rows)
+        result = execute_query(data, sql, max_rows=rows, profile=self.profile)
+        if result.dataset_key != self.dataset_key:
+            raise DatasetChanged(f"Dataset changed from {self.dataset_key} to {result.dataset_key}")
+        return table_to_pandas(result.table.rename_columns(self.table.column_names))
+
+
+def register_dataset(conn: duckdb.DuckDBPyConnection, data: Path | pa.Table | pd.DataFrame) -> None:
+    """Expose the dataset to DuckDB as `llm_df`.
+
+    A DuckDB store is attached read-only as the default catalog, so its
+    rollup tables resolve by name too. A partitioned Parquet directory becomes
+    a view over `read_parquet`, so month/year filters prune partitions and
+    nothing is loaded up front. Arrow tables and DataFrames are registered as
+    they are, an Arrow table is scanned in place without a conversion.
+    """
+    if isinstance(data, Path) and data.suffix == DUCKDB_SUFFIX:
+        db_file = data.as_posix().replace("'", "''")
+        conn.execute(f"ATTACH '{db_file}' AS store (READ_ONLY)")
+        conn.execute("USE store")
+    elif isinstance(data, Path):
+        parquet_glob = data.joinpath("**", "*.parquet").as_posix().replace("'", "''")
+        conn.execute(
+            f"CREATE OR REPLACE VIEW llm_df AS "
+            f"SELECT * FROM read_parquet('{parquet_glob}', hive_partitioning = true)"
+        )
+    else:
+        conn.register("llm_df", data)
+
+
+def connect_dataset(data: Path | pa.Table | pd.DataFrame, config: dict | None = None) -> duckdb.DuckDBPyConnection:
+    """Open an in-memory DuckDB connection with the dataset available as `llm_df`.
+
+    `config` holds DuckDB settings of the new database. A DuckDB store is
+    attached rather than opened, since a file can only be opened once per
+    process with a single configuration.
+    """
+    conn = duckdb.connect(config=config or {})
+    register_dataset(conn, data)
+    return conn
+
+
+def profile_config(profile: str) -> dict:
+    """DuckDB settings of a query profile, with the deployment's environment overrides applied."""
+    settings = dict(QUERY_PROFILES[profile])
+    for setting in settings:
+        override = os.getenv(f"QUERY_{profile}_{setting}".upper())
+        if override is not None:
+            settings[setting] = override
+    settings["temp_directory"] = SPILL_PATH.joinpath(profile).as_posix()
+    return settings
+
+
+def available_rollups(conn: duckdb.DuckDBPyConnection) -> set:
+    """Names of the rollup tables present in the connected DuckDB store."""
+    rows = conn.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_name LIKE 'rollup_%'"
+    ).fetchall()
+    return {name for (name,) in rows}
+
+
+def dataset_key(data: Path | pa.Table | pd.DataFrame) -> Hashable:
+    """Identity of a dataset version, changing whenever its contents may have.
+
+    The published dataset is keyed by its published version, since a DuckDB
+    store keeps its path across ingests. Other paths are keyed by their
+    modification time and in-memory tables by object identity.
+    """
+    published, version = active_dataset()
+    if data is published:
+        return ("published", version)
+    if isinstance(data, Path):
+        return (data.as_posix(), data.stat().st_mtime_ns)
+    return ("object", id(data))
+
+
+class QueryEngine:
+    """One DuckDB database per process and query profile with the dataset registered once.
+
+    The database runs with the thread count, memory limit and spill directory
+    of its profile. Every thread, i.e. every running Streamlit session, gets
+    its own cursor on that database, so sessions query concurrently while
+    sharing DuckDB's buffer and metadata caches. When the dataset key changes
+    the database is opened again and threads switch to it on their next query.
+    The old one is freed once its last cursor is gone, so queries already
+    running are not cut off.
+    """
+
+    def __init__(self, profile: str = "main"):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._threads = threading.local()
+        # (key, data, connection, rollups), replaced as a whole on re-registration
+        self._state = (None, None, None, set())
+
+    def _open(self, key: Hashable, data: Path | pa.Table | pd.DataFrame) -> tuple:
+        config = profile_config(self.profile)
+        conn = connect_dataset(data, config) if isinstance(data, Path) else duckdb.connect(config=config)
+        is_store = isinstance(data, Path) and data.suffix == DUCKDB_SUFFIX
+        rollups = available_rollups(conn) if is_store else set()
+        logger.info(f"Query engine {self.profile} registered dataset {key} with {config}")
+        return (key, data, conn, rollups)
+
+    def cursor(self, data: Path | pa.Table | pd.DataFrame) -> Tuple[duckdb.DuckDBPyConnection, set, Hashable]:
+        """This thread's cursor on `data`, the rollups it can be routed to and the dataset key it reads."""
+        key = dataset_key(data)
+        state = self._state
+        if state[0] != key:
+            with self._lock:
+                if self._state[0] != key:
+                    self._state = self._open(key, data)
+                state = self._state
+
+        threads = self._threads
+        if getattr(threads, "key", None) != key:
+            cursor = state[2].cursor()
+            # The default catalog and Python objects are set per connection, so each cursor needs its own
+            if not isinstance(data, Path):
+                cursor.register("llm_df", data)
+            elif data.suffix == DUCKDB_SUFFIX:
+                cursor.execute("USE store")
+            threads.key, threads.cursor = key, cursor
+        return threads.cursor, state[3], key
+
+
+@st.cache_resource(show_spinner=False)
+def query_engine(profile: str) -> QueryEngine:
+    """The process-wide query engine of a query profile, shared by every session."""
+    return QueryEngine(profile)
+
+
+def profile_file() -> Path:
+    """Where DuckDB writes the JSON profile of the last query of this thread's cursor."""
+    return Path(tempfile.gettempdir()).joinpath(f"duckdb-profile-{os.getpid()}-{threading.get_ident()}.json")
+
+
+def log_profile(sql: str, routed: str, query_profile: dict, total_rows: int) -> None:
+    """Append a query profile to the rotating profile log, one JSON record per line."""
+    record = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sql": sql,
+        "routed_sql": routed,
+        "total_rows": total_rows,
+        "latency": query_profile.get("latency"),
+        "cpu_time": query_profile.get("cpu_time"),
+        "rows_scanned": query_profile.get("cumulative_rows_scanned"),
+        "peak_buffer_memory": query_profile.get("system_peak_buffer_memory"),
+        "peak_temp_dir_size": query_profile.get("system_peak_temp_dir_size"),
+        "profile": query_profile,
+    }
+    profile_logger.info(json.dumps(record))
+
+
+@st.cache_resource(show_spinner=False)
+def query_executor() -> ThreadPoolExecutor:
+    """Worker threads running the queries of every session."""
+    return ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="query")
+
+
+def execute_query(
+    data: Path | pa.Table | pd.DataFrame,
+    sql: str,
+    timeout: float = QUERY_TIMEOUT_SECONDS,
+    on_wait: Optional[Callable[[float], None]] = None,
+    max_rows: int = RESULT_MAX_ROWS,
+    profile: str = "main",
+    profiling: bool = QUERY_PROFILING,
+) -> QueryResult:
+    """Run `sql` on a query worker with the resources of a query `profile`,
+    routed to a rollup table where one answers it.
+
+    The result is read in Arrow record batches and only its first `max_rows`
+    rows are kept, later batches are just counted, so the memory a query
+    takes stays bounded whatever it returns. With `profiling` on, DuckDB's
+    detailed JSON profile of the run (operator timings, rows scanned, peak
+    memory) is attached to the result and written to the profile log.
+
+    The calling thread polls the worker and passes the elapsed seconds to
+    `on_wait`. The query is interrupted once it runs past `timeout` seconds,
+    raising `QueryTimeout`, or when anything is raised while waiting on it.
+    Streamlit stops or reruns a script by raising from its next `st` call, so
+    an `on_wait` that updates the page also cancels the query when the user
+    submits a new question or leaves.
+    """
+    engine = query_engine(profile)
+    running = {"cursor": None, "cancelled": False}
+    lock = threading.Lock()
+
+    def job() -> QueryResult:
+        cursor, rollups, key = engine.cursor(data)
+        with lock:
+            if running["cancelled"]:
+                raise QueryTimeout("Query cancelled before it started")
+            running["cursor"] = cursor
+        routed = route_query(sql, rollups) if rollups else sql
+        if profiling:
+            output = profile_file()
+            cursor.execute("SET profiling_mode = 'detailed'")
+            cursor.execute(f"SET profiling_output = '{output.as_posix()}'")
+            cursor.execute("SET enable_profiling = 'json'")
+        try:
+            reader = cursor.execute(routed).fetch_record_batch(RESULT_BATCH_ROWS)
+            batches, total_rows = [], 0
+            for batch in reader:
+                if total_rows < max_rows:
+                    batches.append(batch.slice(0, max_rows - total_rows))
+                total_rows += batch.num_rows
+            # The profile file is rewritten by every statement, so it is read before profiling is turned off
+            query_profile = json.loads(output.read_text()) if profiling else None
+        finally:
+            if profiling:
+                cursor.execute("PRAGMA disable_profiling")
+
+        if query_profile is not None:
+            log_profile(sql, routed, query_profile, total_rows)
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        if total_rows > max_rows:
+            # Rows without an ORDER BY, or tied in it, come in any order, the
+            # first page is fetched again in the order the later pages use
+            first_page = paged_sql(routed, len(reader.schema), 0, max_rows)
+            table = cursor.execute(first_page).fetch_arrow_table().rename_columns(reader.schema.names)
+        return QueryResult(sql, table, total_rows, profile, query_profile, key)
+
+    start = time.perf_counter()
+    future = query_executor().submit(job)
+    try:
+        while True:
+            try:
+                return future.result(timeout=QUERY_POLL_SECONDS)
+            except TimeoutError:
+                elapsed = time.perf_counter() - start
+                if elapsed > timeout:
+                    raise QueryTimeout(f"Query cancelled after {elapsed:.1f}s")
+                if on_wait is not None:
+                    on_wait(elapsed)
+    except BaseException:
+        if not future.done():
+            with lock:
+                running["cancelled"] = True
+                cursor = running["cursor"]
+            if cursor is not None:
+                cursor.interrupt()
+            logger.warning(f"Interrupted query after {time.perf_counter() - start:.1f}s: {sql}")
+        raise
@@ -0,0 +1,166 @@
+from sqlglot import parse_one, exp
+from sqlglot.errors import ParseError
+
+from src.constants import *
+from src.utils.logging import logger
+
+
+def rollup_table(level: str) -> str:
+    """Name of the rollup table aggregated down to a hierarchy `level`."""
+    return f"rollup_{level}"
+
+
+def rollup_measures() -> list[str]:
+    """Additive columns summed in every rollup table."""
+    return [
+        col for col in COLUMNS_MAP.values()
+        if col not in STRING_COLUMNS and col not in PARTITION_COLUMNS
+    ]
+
+
+def rollup_ddl(catalog: str, level: str) -> str:
+    """DDL of the rollup table for one hierarchy level."""
+    keys = HIERARCHY_COLUMNS[: HIERARCHY_COLUMNS.index(level) + 1]
+    key_defs = ", ".join(f'"{col}" VARCHAR' for col in keys)
+    measure_defs = ", ".join(f'"{col}" BIGINT' for col in rollup_measures())
+    return (
+        f"CREATE TABLE IF NOT EXISTS {catalog}.{rollup_table(level)} "
+        f"(year INTEGER, month INTEGER, {key_defs}, {measure_defs}, {ROLLUP_ROW_COUNT} BIGINT)"
+    )
+
+
+def append_rollups(conn, catalog: str, staging: str) -> None:
+    """Aggregate newly staged rows into the rollup table of every hierarchy level.
+
+    Incremental ingests only stage months that are not cached yet, so the new
+    rollup rows never overlap the existing ones.
+    """
+    sums = ", ".join(f'SUM("{col}") AS "{col}"' for col in rollup_measures())
+    for level in HIERARCHY_COLUMNS:
+        keys = ", ".join(f'"{col}"' for col in HIERARCHY_COLUMNS[: HIERARCHY_COLUMNS.index(level) + 1])
+        conn.execute(rollup_ddl(catalog, level))
+        conn.execute(
+            f"INSERT INTO {catalog}.{rollup_table(level)} "
+            f"SELECT year, month, {keys}, {sums}, COUNT(*) AS {ROLLUP_ROW_COUNT} "
+            f"FROM {staging} GROUP BY year, month, {keys} ORDER BY year, month"
+        )
+
+
+def _is_additive(node: exp.Expression, dims: set) -> bool:
+    """Whether SUM over `node` equals the SUM of its per-group sums.
+
+    Allowed are measure columns, their sums and differences, zero, NULL and
+    CASE expressions whose conditions only use rollup dimensions.
+    """
+    if isinstance(node, exp.Paren):
+        return _is_additive(node.this, dims)
+    if isinstance(node, exp.Column):
+        return node.name in rollup_measures()
+    if isinstance(node, exp.Null):
+        return True
+    if isinstance(node, exp.Literal):
+        return not node.is_string and node.this in ("0", "0.0")
+    if isinstance(node, (exp.Add, exp.Sub)):
+        return _is_additive(node.left, dims) and _is_additive(node.right, dims)
+    if isinstance(node, exp.Neg):
+        return _is_additive(node.this, dims)
+    if isinstance(node, exp.Case):
+        if node.this is not None:
+            return False
+        for when in node.args.get("ifs", []):
+            condition_cols = {col.name for col in when.this.find_all(exp.Column)}
+            if not condition_cols <= dims or when.this.find(exp.Subquery, exp.Select):
+                return False
+            if not _is_additive(when.args["true"], dims):
+                return False
+        default = node.args.get("default")
+        return default is None or _is_additive(default, dims)
+    return False
+
+
+def _output_expression(node: exp.Expression, select: exp.Select) -> exp.Expression | None:
+    """The entry of the select list of `select` that `node` is part of, None outside the select list."""
+    while node.parent is not select:
+        node = node.parent
+    return node if node.arg_key == "expressions" else None
+
+
+def route_query(query: str, rollups: set) -> str:
+    """Rewrite a query on `llm_df` to read the smallest rollup that answers it exactly.
+
+    The rewrite only happens when it is semantically safe: a single
+    aggregating, grouping or DISTINCT SELECT on `llm_df` without joins,
+    subqueries, windows or `*`, whose dimension references are year, month
+    and a prefix of the location hierarchy, and whose measures only appear
+    inside additive SUMs or row counts. Routed queries keep their output
+    names and types. Anything else, or a query that fails to parse, is
+    returned unchanged.
+    """
+    try:
+        tree = parse_one(query, read="duckdb")
+    except ParseError:
+        return query
+
+    if not isinstance(tree, exp.Select) or tree.args.get("joins") or tree.args.get("with"):
+        return query
+    tables = list(tree.find_all(exp.Table))
+    if len(tables) != 1 or tables[0].name != "llm_df":
+        return query
+    if any(not isinstance(star.parent, exp.Count) for star in tree.find_all(exp.Star)):
+        return query
+    if tree.find(exp.Window, exp.Subquery) or len(list(tree.find_all(exp.Select))) > 1:
+        return query
+    # A row-level select returns every base row, a rollup only one row per group
+    if not (tree.args.get("group") or tree.args.get("distinct") or tree.find(exp.AggFunc)):
+        return query
+
+    aliases = {select.alias for select in tree.expressions if select.alias}
+    hierarchy_refs = set()
+    for col in tree.find_all(exp.Column):
+        name = col.name
+        if name in HIERARCHY_COLUMNS:
+            hierarchy_refs.add(name)
+        elif name in PARTITION_COLUMNS or (name in aliases and name not in COLUMNS_MAP.values()):
+            continue
+        elif name in rollup_measures():
+            if not isinstance(col.find_ancestor(exp.Sum, exp.AggFunc), exp.Sum):
+                return query
+        else:
+            return query
+
+    depth = max((HIERARCHY_COLUMNS.index(col) for col in hierarchy_refs), default=0)
+    level = HIERARCHY_COLUMNS[depth]
+    if rollup_table(level) not in rollups:
+        return query
+    dims = set(HIERARCHY_COLUMNS[: depth + 1]) | set(PARTITION_COLUMNS)
+
+    for agg in list(tree.find_all(exp.AggFunc)):
+        if isinstance(agg, exp.Sum):
+            if not _is_additive(agg.this, dims):
+                return query
+        elif isinstance(agg, exp.Count) and isinstance(agg.this, exp.Star):
+            # SUM of the counts is HUGEINT, cast back so a routed count keeps COUNT's BIGINT type
+            count = exp.cast(
+                exp.func("COALESCE", exp.Sum(this=exp.column(ROLLUP_ROW_COUNT)), exp.Literal.number(0)),
+                "BIGINT",
+            )
+            # An unaliased count keeps the column name DuckDB gives COUNT(*)
+            output = _output_expression(agg, tree)
+            if output is agg:
+                count = exp.alias_(count, "count_star()", quoted=True)
+            elif output is not None and not isinstance(output, exp.Alias):
+                return query
+            agg.replace(count)
+        elif isinstance(agg, exp.Count) and isinstance(agg.this, exp.Distinct):
+            if not all(isinstance(e, exp.Column) and e.name in dims for e in agg.this.expressions):
+                return query
+        elif isinstance(agg, (exp.Min, exp.Max)):
+            if not all(col.name in dims for col in agg.find_all(exp.Column)):
+                return query
+        else:
+            return query
+
+    tables[0].set("this", exp.to_identifier(rollup_table(level)))
+    routed = tree.sql(dialect="duckdb")
+    logger.info(f"Routed query to {rollup_table(level)}")
+    return routed
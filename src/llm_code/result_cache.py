@@ -0,0 +1,137 @@
+import threading
+import streamlit as st
+from collections import OrderedDict
+from typing import Hashable, Tuple
+from sqlglot import parse_one, exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+
+from src.constants import *
+from src.utils.logging import logger
+from .query_engine import QueryResult
+
+
+def sort_conjuncts(condition: exp.Expression) -> exp.Expression:
+    """Order the AND-ed predicates of a condition, which does not change its meaning."""
+    conjuncts = list(condition.flatten()) if isinstance(condition, exp.And) else [condition]
+    return exp.and_(*sorted(conjuncts, key=lambda node: node.sql(dialect="duckdb")), copy=False)
+
+
+def canonical_sql(query: str) -> Tuple[str, list]:
+    """Canonical form of a query, plus the output aliases it was stripped of.
+
+    Whitespace, keyword case and quoting come from regenerating the parsed
+    query. Unquoted identifiers are lowercased like DuckDB resolves them,
+    numeric literals are rewritten in a single spelling, IN lists and the
+    AND-ed predicates of WHERE and HAVING are sorted. In a single SELECT
+    without `*`, output aliases are replaced by positional names when none of
+    them shadows a dataset column, so queries that only differ in how they
+    name their outputs share a key.
+    Raises `SqlglotError` when the query does not parse.
+    """
+    tree = parse_one(query, read="duckdb")
+    # Output names keep the case they were written in, only the key is lowercased
+    output_names = [select.alias or None for select in tree.expressions] if isinstance(tree, exp.Select) else []
+    tree = normalize_identifiers(tree, dialect="duckdb")
+
+    for literal in tree.find_all(exp.Literal):
+        if not literal.is_string:
+            number = literal.this
+            literal.set("this", str(int(number)) if number.isdigit() else number)
+    for in_list in tree.find_all(exp.In):
+        if values := in_list.args.get("expressions"):
+            in_list.set("expressions", sorted(values, key=lambda node: node.sql(dialect="duckdb")))
+    for clause in (exp.Where, exp.Having):
+        for node in tree.find_all(clause):
+            node.set("this", sort_conjuncts(node.this))
+
+    aliases = []
+    flat_select = isinstance(tree, exp.Select) and len(list(tree.find_all(exp.Select))) == 1
+    if flat_select and not tree.args.get("with") and not tree.find(exp.Star):
+        named = {select.alias: f"_c{i}" for i, select in enumerate(tree.expressions) if select.alias}
+        if named and not set(named) & set(COLUMNS_MAP.values()):
+            aliases = output_names
+            for col in tree.find_all(exp.Column):
+                if col.name in named and not col.table:
+                    col.set("this", exp.to_identifier(named[col.name]))
+            for select in tree.expressions:
+                if isinstance(select, exp.Alias):
+                    select.set("alias", exp.to_identifier(named[select.alias]))
+
+    return tree.sql(dialect="duckdb"), aliases
+
+
+class ResultCache:
+    """LRU cache of query results, whose Arrow tables are kept within a byte budget.
+
+    Results are keyed by the dataset key and the canonical SQL, so a new
+    dataset version never serves stale rows and the old entries age out.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> QueryResult | None:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Hashable, result: QueryResult) -> None:
+        if result.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key).nbytes
+            self._entries[key] = result
+            self._bytes += result.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def stats(self) -> dict:
+        """Hit and miss counts and the current size of the cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+
+@st.cache_resource(show_spinner=False)
+def result_cache() -> ResultCache:
+    """The process-wide result cache shared by every session."""
+    return ResultCache()
+
+
+def cached_result(dataset_key: Hashable, query: str, run_query) -> QueryResult:
+    """Result of `query`, from the cache or from `run_query(query)` on a miss.
+
+    Queries that sqlglot cannot parse are run without caching.
+    """
+    if not RESULT_CACHE_ENABLED:
+        return run_query(query)
+    try:
+        canonical, aliases = canonical_sql(query)
+    except SqlglotError:
+        return run_query(query)
+
+    cache = result_cache()
+    key = (dataset_key, canonical)
+    if (result := cache.get(key)) is not None:
+        logger.info(f"Result cache hit: {cache.stats()}")
+        if aliases:
+            result = result.renamed(
+                [alias or name for alias, name in zip(aliases, result.table.column_names)]
+            )
+        return result
+
+    result = run_query(query)
+    cache.put(key, result)
+    return result
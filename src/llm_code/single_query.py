@@ -7,8 +7,8 @@ import time
 from src.llm_code.streamlit_helper import (
      latest_month_year, generate_enhanced_question, write_question,
     check_specific_word, check_month_in_question, generate_sql_openai,
-    execute_sql, display_summary, display_chart_analytics, display_table,
-    get_why_result, store_query_result, re_write_query_with_month, 
+    query_result, display_summary, display_chart_analytics, display_table,
+    get_why_result, store_query_result, re_write_query_with_month, template_sql,
 )
 from src.llm_code.streamlit_helper import NO_DATA_ANIM, LOADING_ANIM, LOADING_CHARTS
 from src.prompts.prompts import prompt, prompt_2 
@@ -54,7 +54,7 @@ def single_query (user_input, llm_df):
                 progress_bar = st.progress(0)
                 anim_placeholder = st.empty()
                 step_placeholder = st.empty()
-                sql_query, df_result = None, None
+                sql_query, df_result, result = None, None, None
 
                 with anim_placeholder:
                     st_lottie(LOADING_ANIM, height=200, key="loader")
@@ -64,12 +64,19 @@ def single_query (user_input, llm_df):
                     progress_bar.progress(progress)
 
                     if "Thinking" in step:
-                        sql_query = generate_sql_openai(enhanced_question, LATEST_MONTH, LATEST_YEAR, prompt_used)
+                        # Common question shapes are answered from templates, skipping the LLM round trip
+                        sql_query = template_sql(updated_question, LATEST_YEAR)
+                        if sql_query is None:
+                            sql_query = generate_sql_openai(enhanced_question, LATEST_MONTH, LATEST_YEAR, prompt_used)
                         st.session_state.ex_sql = sql_query
                         logger.info(f"Generated SQL Query \n {sql_query}")
 
                     if "Searching Database" in step:
-                        result_data = execute_sql(sql_query, llm_df)
+                        result = query_result(
+                            sql_query, llm_df,
+                            on_wait=lambda elapsed: step_placeholder.write(f"### {step} ({elapsed:.0f}s)"),
+                        )
+                        result_data = result.to_pandas() if result is not None else None
                         df_result = result_data if isinstance(result_data, pd.DataFrame) else pd.DataFrame(result_data)
                         
                 anim_placeholder.empty()
@@ -93,7 +100,7 @@ def single_query (user_input, llm_df):
 
                     with st.container():
                         current_fig, chart_config, unique_key = display_chart_analytics(
-                            df_result.copy(), unique_key=unique_key, is_editable=True
+                            df_result, unique_key=unique_key, is_editable=True
                         )
 
                     # clear loader
@@ -115,6 +122,7 @@ def single_query (user_input, llm_df):
                     sql_query=sql_query,
                     why_result=why_result if st.session_state.show_why else None,
                     unique_key=unique_key,
+                    result=result,
                 )
 
                 st.session_state.query_processed = True
@@ -1,13 +1,15 @@
 import torch
 import sqlparse
 import streamlit as st
-from typing import Optional
+from typing import Callable, Optional
 import duckdb
 import pandas as pd
 import openai
 from openai import OpenAI
 import os
 import requests
+import pyarrow as pa
+from pathlib import Path
 from dotenv import load_dotenv
 
 
@@ -15,6 +17,10 @@ from src.utils.decorator import time_checker
 from transformers import AutoTokenizer, AutoModelForCausalLM
 from src.utils.logging import logger
 from src.constants import *
+from .query_engine import execute_query, dataset_key, QueryResult, QueryTimeout
+from .result_cache import cached_result
+from .sql_guard import guard_query
+from .data_processor_and_loader import load_stats
 
 # logger.info(f"Initialized Model : {MODEL_NAME} ")
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
@@ -176,13 +182,48 @@ def generate_summary_openrouterai(df, prompt: str = None):
         return f"Error: API call failed - {e}"
 
 
-def execute_sql(query: str, df: pd.DataFrame) -> Optional[pd.DataFrame]:
-    """Execute SQL query on the DataFrame using DuckDB."""
+def query_result(
+    query: str,
+    df: Path | pa.Table | pd.DataFrame,
+    on_wait: Optional[Callable[[float], None]] = None,
+    profile: str = "main",
+    profiling: bool = QUERY_PROFILING,
+) -> Optional[QueryResult]:
+    """Execute SQL query on the dataset through the shared DuckDB query engine, reusing cached results.
+
+    The query runs on a query worker with the resources of the `QUERY_PROFILES`
+    entry `profile` and is cancelled after `QUERY_TIMEOUT_SECONDS`, `on_wait`
+    receives the seconds it has been running so far. With `profiling` on, the
+    result carries DuckDB's profile of the query, a cached result the profile
+    of the run that produced it. The result holds at most `RESULT_MAX_ROWS`
+    rows, None when the query failed or returned none.
+    """
+    query, note = guard_query(query, load_stats())
+    if query is None:
+        logger.warning(f"Rejected query: {note}")
+        st.error(note)
+        return None
+    if note:
+        st.warning(note)
+
     try:
-        with duckdb.connect() as conn:
-            conn.register("llm_df", df)
-            result = conn.execute(query).fetchdf()
-            return result if not result.empty else None
+        result = cached_result(
+            dataset_key(df), query, lambda sql: execute_query(df, sql, on_wait=on_wait, profile=profile, profiling=profiling)
+        )
+        return result if result.total_rows else None
+
+    except QueryTimeout as e:
+        logger.warning(f"SQL execution timed out: {str(e)}")
+        st.warning(
+            f"The query ran for more than {QUERY_TIMEOUT_SECONDS} seconds and was cancelled. "
+            "Please narrow the question, e.g. to a single month."
+        )
+        return None
+
+    except duckdb.OutOfMemoryException as e:
+        logger.error(f"SQL execution ran out of memory: {str(e)}")
+        st.warning("This question needs more memory than the server allows. Please narrow it, e.g. to a single month.")
+        return None
 
     except duckdb.Error as e:
         logger.error(f"SQL execution failed: {str(e)}")
@@ -190,6 +231,18 @@ def execute_sql(query: str, df: pd.DataFrame) -> Optional[pd.DataFrame]:
         return None
 
 
+def execute_sql(
+    query: str,
+    df: Path | pa.Table | pd.DataFrame,
+    on_wait: Optional[Callable[[float], None]] = None,
+    profile: str = "main",
+    profiling: bool = QUERY_PROFILING,
+) -> Optional[pd.DataFrame]:
+    """The first `RESULT_MAX_ROWS` rows of `query_result` as a DataFrame."""
+    result = query_result(query, df, on_wait, profile, profiling)
+    return result.to_pandas() if result is not None else None
+
+
 def generate_sql_openai(question: str, latest_month: str, latest_year: str, prompt: str):
     """
     Generates SQL using OpenAI API instead of OpenRouter.
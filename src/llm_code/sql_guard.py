@@ -0,0 +1,155 @@
+import math
+from typing import Tuple
+from sqlglot import parse_one, exp
+from sqlglot.errors import SqlglotError
+
+from src.constants import *
+from src.utils.logging import logger
+
+
+def conjuncts(condition: exp.Expression) -> list[exp.Expression]:
+    """The AND-ed predicates of a condition, through nested ANDs and parentheses."""
+    condition = condition.unnest()
+    if not isinstance(condition, exp.And):
+        return [condition]
+    return [predicate for part in condition.flatten() for predicate in conjuncts(part)]
+
+
+def where_conjuncts(select: exp.Select) -> list[exp.Expression]:
+    """The AND-ed predicates of a SELECT's WHERE clause."""
+    where = select.args.get("where")
+    if where is None:
+        return []
+    return conjuncts(where.this)
+
+
+def equality_values(predicate: exp.Expression) -> Tuple[str | None, list]:
+    """Column and literal values of a `col = value` or `col IN (...)` predicate."""
+    if isinstance(predicate, exp.EQ) and isinstance(predicate.left, exp.Column) and isinstance(predicate.right, exp.Literal):
+        return predicate.left.name.lower(), [predicate.right.this]
+    if isinstance(predicate, exp.In) and isinstance(predicate.this, exp.Column):
+        values = predicate.args.get("expressions") or []
+        if values and all(isinstance(value, exp.Literal) for value in values):
+            return predicate.this.name.lower(), [value.this for value in values]
+    return None, []
+
+
+def self_joined(select: exp.Select) -> bool:
+    """Whether a SELECT reads the raw `llm_df` table more than once in its FROM and JOINs.
+
+    Joins of aggregated subqueries or CTEs, as in month comparisons, stay allowed.
+    """
+    sources = [join.this for join in select.args.get("joins") or []]
+    if select.args.get("from"):
+        sources.append(select.args["from"].this)
+    return sum(isinstance(source, exp.Table) and source.name == "llm_df" for source in sources) > 1
+
+
+def reads_table(tree: exp.Expression) -> bool:
+    """Whether a query is a single SELECT straight from `llm_df`, without joins."""
+    source = tree.args.get("from")
+    return (
+        isinstance(tree, exp.Select)
+        and not tree.args.get("joins")
+        and source is not None
+        and isinstance(source.this, exp.Table)
+        and source.this.name == "llm_df"
+    )
+
+
+def period_value(value: str) -> int | None:
+    """A month or year literal as an integer, None when it is not a number."""
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def estimate_rows(select: exp.Select, stats: dict) -> Tuple[int, int]:
+    """Estimated scanned and returned rows of a SELECT on the dataset.
+
+    Scanned rows are the rows of the (year, month) pairs the WHERE clause
+    keeps. Returned rows assume uniformly spread values: equality filters
+    divide by the column's distinct count, GROUP BY multiplies the distinct
+    counts of its columns and an aggregate without GROUP BY returns one row.
+    """
+    columns = stats["columns"]
+    periods = stats["periods"]
+    selectivity = 1.0
+    for predicate in where_conjuncts(select):
+        col, values = equality_values(predicate)
+        if col in PARTITION_COLUMNS:
+            wanted = {period_value(value) for value in values}
+            periods = [period for period in periods if period[col] in wanted]
+        elif col in columns and columns[col]["distinct"]:
+            selectivity *= min(1.0, len(values) / columns[col]["distinct"])
+    scan_rows = sum(period["rows"] for period in periods)
+
+    group = select.args.get("group")
+    if group:
+        groups = 1
+        for key in group.expressions:
+            distinct = columns.get(key.name, {}).get("distinct") if isinstance(key, exp.Column) else None
+            groups *= distinct or scan_rows
+        output_rows = min(groups, scan_rows * selectivity)
+    elif any(select_expr.find(exp.AggFunc) for select_expr in select.expressions):
+        output_rows = 1
+    else:
+        output_rows = scan_rows * selectivity
+
+    limit = select.args.get("limit")
+    if limit is not None and isinstance(limit.expression, exp.Literal):
+        output_rows = min(output_rows, int(limit.expression.this))
+    return scan_rows, math.ceil(output_rows)
+
+
+def guard_query(query: str, stats: dict | None) -> Tuple[str | None, str | None]:
+    """Check generated SQL before it runs, returning the query to run and a note for the user.
+
+    Statements other than queries and joins of the raw table with itself are
+    rejected, the returned query is then None. A query that never mentions
+    month or year and would scan more than `GUARD_MAX_SCAN_ROWS` rows is
+    restricted to the latest month, and one returning more than `GUARD_MAX_RESULT_ROWS`
+    rows gets a LIMIT. Queries sqlglot cannot parse are passed on for
+    DuckDB to report.
+    """
+    if not GUARD_ENABLED:
+        return query, None
+    try:
+        tree = parse_one(query, read="duckdb")
+    except SqlglotError:
+        return query, None
+
+    if not isinstance(tree, exp.Query):
+        return None, "Only questions that read data can be answered, this query would modify it."
+    if any(self_joined(select) for select in tree.find_all(exp.Select)):
+        return None, "This query joins the sales table with itself, which is too costly to run. Please rephrase the question."
+    if not reads_table(tree):
+        # Row counts are only estimated for the plain queries on the table the prompts ask for
+        return query, None
+
+    notes = []
+    if stats is None:
+        # Without statistics only row-level queries without a LIMIT are bounded
+        aggregated = tree.args.get("group") or any(select.find(exp.AggFunc) for select in tree.expressions)
+        if not aggregated and not tree.args.get("limit"):
+            tree = tree.limit(GUARD_MAX_RESULT_ROWS, copy=False)
+            notes.append(f"Only the first {GUARD_MAX_RESULT_ROWS:,} rows can be shown.")
+    else:
+        scan_rows, output_rows = estimate_rows(tree, stats)
+        # Queries that use month or year anywhere, e.g. to group or compare months, are left as they are
+        uses_period = any(col.name.lower() in PARTITION_COLUMNS for col in tree.find_all(exp.Column))
+        if not uses_period and scan_rows > GUARD_MAX_SCAN_ROWS and stats["periods"]:
+            latest = max(stats["periods"], key=lambda period: (period["year"], period["month"]))
+            tree = tree.where(f"year = {latest['year']} AND month = {latest['month']}", dialect="duckdb", copy=False)
+            notes.append(f"No month was given, so only {latest['month']}/{latest['year']} was searched.")
+            scan_rows, output_rows = estimate_rows(tree, stats)
+        if output_rows > GUARD_MAX_RESULT_ROWS:
+            tree = tree.limit(GUARD_MAX_RESULT_ROWS, copy=False)
+            notes.append(f"This question returns about {output_rows:,} rows, only the first {GUARD_MAX_RESULT_ROWS:,} can be shown.")
+
+    if not notes:
+        return query, None
+    guarded = tree.sql(dialect="duckdb")
+    logger.info(f"Guarded query: {guarded}")
+    return guarded, " ".join(notes)
@@ -1,10 +1,11 @@
 import re
 import time
 import random
-import string
 import pandas as pd
 import streamlit as st
 import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from sqlglot import parse_one, exp
 from typing import Generator
 from streamlit_echarts import st_echarts # type: ignore
@@ -12,10 +13,14 @@ from streamlit_lottie import st_lottie # type: ignore
 
 from src.constants import *
 from src.utils.logging import logger
-from .sql_gen_and_exec import execute_sql, generate_sql_openai
+from .sql_gen_and_exec import execute_sql, query_result, generate_sql_openai
 from src.prompts.prompts import prompt, prompt_comparison
 from src.prompts.prompt_examples import two_month_examples, three_month_examples, filter_two_examples, filter_three_examples
-from .data_processor_and_loader import latest_month_year, data_loader
+from .data_processor_and_loader import latest_month_year, available_years_months
+from .ingest_worker import data_loader
+from .query_engine import DatasetChanged, dataset_key, execute_query
+from .result_cache import cached_result
+from .intent_templates import question_months, template_sql
 
 
 def streamlit_initializer():
@@ -134,27 +139,7 @@ def check_specific_word(question: str):
 
 def check_month_in_question(question: str) -> bool:
     """Check if the question contains a valid month reference (full names, numbers with 'month', ordinals)."""
-    translator = str.maketrans("", "", string.punctuation)
-    cleaned_question = question.lower().translate(translator)
-    words = cleaned_question.split()
-
-    month_terms = MONTH_NAMES + MONTH_ABBREVIATIONS
-    if any(word in month_terms for word in words):
-        return True
-
-    for i, word in enumerate(words):
-        if word.isdigit() and 1 <= int(word) <= 12:
-            if (i > 0 and words[i - 1] == "month") or (i < len(words) - 1 and words[i + 1] == "month"):
-                return True
-
-        for suffix in ORDINAL_SUFFIXES:
-            if word.endswith(suffix):
-                num_part = word[:-len(suffix)]
-                if num_part.isdigit() and 1 <= int(num_part) <= 12:
-                    if (i > 0 and words[i - 1] == "month") or (i < len(words) - 1 and words[i + 1] == "month"):
-                        return True
-
-    return False
+    return bool(question_months(question))
 
 def re_write_query_with_month() -> Generator[str, None, None]:
     """Prompt user to include month in query."""
@@ -184,8 +169,8 @@ def display_chart_analytics(df: pd.DataFrame, unique_key, is_editable=True):
         st.warning("No data available for chart visualization.")
         return None, None, unique_key
 
-    df.columns = [convert_to_readable_format_simple(col) for col in df.columns]
-    df = df.rename(columns=lambda col: col.title() if isinstance(col, str) else col)
+    # Renaming returns a new frame, so the caller's one is left untouched
+    df = df.rename(columns=lambda col: convert_to_readable_format_simple(col).title())
 
     non_numeric_columns, all_numeric_columns, _ = process_columns(df)
 
@@ -272,6 +257,21 @@ def display_chat_history():
             with st.container():
                 display_table(df)
 
+            result = exchange.get("result")
+            if result is not None and len(df_data) < result.total_rows:
+                st.caption(f"Showing the first {len(df_data):,} of {result.total_rows:,} rows.")
+                if st.button("Load more rows", key=f"more_rows_{unique_key}_{idx}", disabled=not is_editable):
+                    try:
+                        more_rows = result.page(data_loader(), offset=len(df_data))
+                    except DatasetChanged:
+                        st.warning("The data was refreshed since this answer, ask the question again to see more rows.")
+                    else:
+                        exchange["data"] = pd.concat([df_data, more_rows], ignore_index=True)
+                        st.rerun()
+
+            if exchange.get("profile"):
+                with st.expander("Query profile"):
+                    st.json(exchange["profile"], expanded=False)
             
 
             why_results = exchange.get("why_result")
@@ -314,8 +314,12 @@ def display_chat_history():
 
             st.divider()
 
-def store_query_result(question, df_result, sql_query, why_result=None, unique_key=None):
-    """Stores the current query result into chat_history with mode awareness."""
+def store_query_result(question, df_result, sql_query, why_result=None, unique_key=None, result=None):
+    """Stores the current query result into chat_history with mode awareness.
+
+    `result` is the query's result handle, used to page in rows beyond the first
+    ones, its DuckDB profile is kept with the entry when profiling is on.
+    """
     mode = "contextual" if st.session_state.chat_mode == "Contextual Query" else "single"
 
     entry = {
@@ -325,6 +329,8 @@ def store_query_result(question, df_result, sql_query, why_result=None, unique_k
         "why_result": why_result,
         "unique_key": unique_key,
         "mode": mode,
+        "result": result,
+        "profile": result.query_profile if result is not None else None,
     }
 
     if mode == "contextual":
@@ -341,9 +347,17 @@ def store_query_result(question, df_result, sql_query, why_result=None, unique_k
             print(f"Updated context_history: {st.session_state.context_history}")
             entry["context_chain"] = st.session_state.context_history.copy()
 
+    # Only the latest entry can process its 'Why', earlier breakdowns still running are not needed anymore
+    for previous in st.session_state.chat_history:
+        cancel_speculative_why(previous)
     st.session_state.chat_history.append(entry)
     if len(st.session_state.chat_history) > MAX_HISTORY_LENGTH:
         st.session_state.chat_history.pop(0)
+    if WHY_SPECULATIVE and why_result is None and df_result is not None and not df_result.empty:
+        try:
+            speculate_why(entry, data_loader())
+        except Exception as e:
+            logger.warning(f"Could not start the speculative 'Why': {e}")
 
 def build_contextual_question(new_question: str) -> str:
     """Construct a contextual query with Main/Follow-up style, limiting to 5 questions."""
@@ -503,7 +517,7 @@ def display_recent_queries():
             else full_question
         )
         unique_key = exchange.get("unique_key", f"default_{idx}")
-        why_result = exchange["why_result"]
+        why_result = exchange["why_result"] if exchange["why_result"] is not None else speculative_why(exchange)
 
         with st.sidebar.expander(f"Q{idx}: {truncated}", expanded=False):
             st.write(full_question)
@@ -558,46 +572,54 @@ def get_last_non_numeric_column(result_df):
         return last_non_numeric_col, unique_values
     return None, None
 
-def get_why_result(result_df):
-    """Display Why results"""
-    llm_df = data_loader()
-    LATEST_MONTH, LATEST_YEAR = latest_month_year(llm_df)
-    st.write("### Why Results")
-    sql_query = st.session_state.ex_sql
-    last_col, last_col_values = get_last_non_numeric_column(result_df)
-    year, month = extract_month_year_from_sql(sql_query)
-    limit = extract_limit_from_sql(sql_query)
-    print(f"LIMIT VALUE : {limit}")
+def build_why_sql(sql_query, result_df):
+    """Build the 'Why' SQL from the original query's AST, without the LLM.
 
-    if not last_col:
-        logger.info("No value for the 'WHY analysis")
-        return pd.DataFrame()
-
-    why_question = f"""
-    Generate SQL to return:
-    SUM(mro) AS total_mro, 
-    SUM(unproductive_mro) AS total_unproductive_mro, 
-    SUM(unassorted_mro) AS total_unassorted_mro, 
-    SUM(stockout_mro) AS total_stockout_mro
-    FROM the same table.
-
-    Rules:
-    - SELECT and GROUP BY only {last_col}
-    - Use WHERE {last_col} IN ({', '.join(map(str, last_col_values))})
-    - AND month = {month} AND year = {year}
-    - LIMIT {limit if limit else 1}
-    Do not add OR, IS NULL, or extra conditions.
+    It sums `WHY_COLUMNS` for the values of the result's last non-numeric
+    column, in the month and year the original query filtered on and with its
+    LIMIT. Returns None when that column is not a plain column of `llm_df` or
+    the month or year is not a known number.
     """
+    last_col, last_col_values = get_last_non_numeric_column(result_df)
+    if not last_col:
+        return None
+    try:
+        expression = parse_one(sql_query, read="duckdb")
+    except Exception as e:
+        logger.error(f"Error parsing SQL for 'Why': {e}")
+        return None
 
-    why_sql = generate_sql_openai(why_question, latest_month=LATEST_MONTH, latest_year=LATEST_YEAR, prompt=prompt)
-    logger.info(f"This is WHY SQL : \n{why_sql}")
+    # The result columns may already be renamed for display, e.g. "Total Sales" for total_sales
+    def display_key(name):
+        return str(name).replace("_", " ").lower()
 
-    # try:
-    why_result = execute_sql(why_sql, llm_df)
-    if why_result.empty:
-        st.write("No data available for the 'Why' analysis.")
-        return pd.DataFrame()
+    source = next(
+        (select for select in expression.selects if display_key(select.alias_or_name) == display_key(last_col)), None
+    )
+    source = source.unalias() if source is not None else None
+
+    # Only integer literals, a month or year compared with e.g. a subquery cannot be rebuilt
+    def period_number(value):
+        return int(value) if isinstance(value, str) and value.isdigit() else None
 
+    year, month = (period_number(value) for value in extract_month_year_from_sql(expression))
+    values = [value for value in last_col_values if value is not None]
+    if not isinstance(source, exp.Column) or source.name not in COLUMNS_MAP.values() or not (year and month and values):
+        logger.info(f"No 'Why' analysis for column {last_col}, month {month}, year {year}")
+        return None
+
+    column = exp.column(source.name)
+    why_query = (
+        exp.select(column, *[f"SUM({col}) AS total_{col}" for col in WHY_COLUMNS])
+        .from_("llm_df")
+        .where(column.isin(*values), f"month = {month}", f"year = {year}")
+        .group_by(column)
+        .limit(extract_limit_from_sql(expression) or len(values))
+    )
+    return why_query.sql(dialect="duckdb")
+
+def format_why_result(why_result):
+    """Why query result as displayed: each MRO part with its share of the total and readable column names."""
     for col in ["total_unproductive_mro", "total_unassorted_mro", "total_stockout_mro"]:
         if col in why_result.columns and "total_mro" in why_result.columns:
             why_result[col] = why_result[col].astype(float)
@@ -608,6 +630,91 @@ def get_why_result(result_df):
     why_result.columns = [convert_to_readable_format_simple(col) for col in why_result.columns]
     df_why_result = why_result.rename(columns=lambda col: col.title() if isinstance(col, str) else col)
     df_why_result.index = df_why_result.index + 1
+    return df_why_result
+
+class WhyCancelled(Exception):
+    """A speculative 'Why' breakdown was cancelled since it is no longer needed."""
+
+@st.cache_resource(show_spinner=False)
+def why_executor() -> ThreadPoolExecutor:
+    """The single background worker of speculative 'Why' breakdowns, so they never take more than one query worker."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="why")
+
+def speculate_why(entry, data):
+    """Start computing the 'Why' breakdown of a chat history entry in the background.
+
+    The future is kept on the entry as "why_future". Setting its "why_cancel"
+    event drops it before it starts or interrupts its query while it runs.
+    Everything, building the SQL included, runs in the job, so a failure only
+    shows up as a missing breakdown and never fails the answer itself. No
+    `st` calls are made off the script thread.
+    """
+    sql_query, result_df = entry["sql"], entry["data"]
+    cancelled = threading.Event()
+
+    def stop_if_cancelled(elapsed):
+        if cancelled.is_set():
+            raise WhyCancelled()
+
+    def compute():
+        if cancelled.is_set():
+            return None
+        why_sql = build_why_sql(sql_query, result_df)
+        if why_sql is None:
+            return None
+        result = cached_result(
+            dataset_key(data), why_sql,
+            lambda sql: execute_query(data, sql, on_wait=stop_if_cancelled, profile="why"),
+        )
+        return format_why_result(result.to_pandas()) if result.total_rows else None
+
+    entry["why_cancel"] = cancelled
+    entry["why_future"] = why_executor().submit(compute)
+
+def speculative_why(entry, wait=False):
+    """The speculatively computed 'Why' breakdown of a chat history entry, None when there is none.
+
+    Without `wait` only a finished breakdown is returned. With it a running one
+    is waited for, one still queued is cancelled so the caller runs it itself.
+    """
+    future = entry.get("why_future") if entry else None
+    if future is None or future.cancelled():
+        return None
+    if not future.done() and not (wait and future.running()):
+        if wait:
+            cancel_speculative_why(entry)
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        logger.warning(f"Speculative 'Why' failed: {e}")
+        return None
+
+def cancel_speculative_why(entry):
+    """Cancel the unfinished speculative 'Why' breakdown of a chat history entry, a finished one is kept."""
+    future = entry.get("why_future")
+    if future is None or future.done():
+        return
+    entry["why_cancel"].set()
+    future.cancel()
+    entry["why_future"] = None
+
+def get_why_result(result_df):
+    """Display Why results, taken from the speculative breakdown when there is one."""
+    st.write("### Why Results")
+    entry = next((entry for entry in st.session_state.chat_history if entry.get("sql") == st.session_state.ex_sql), None)
+    df_why_result = speculative_why(entry, wait=True)
+    if df_why_result is None:
+        why_sql = build_why_sql(st.session_state.ex_sql, result_df)
+        if why_sql is None:
+            return pd.DataFrame()
+        logger.info(f"This is WHY SQL : \n{why_sql}")
+
+        why_result = execute_sql(why_sql, data_loader(), profile="why")
+        if why_result is None or why_result.empty:
+            st.write("No data available for the 'Why' analysis.")
+            return pd.DataFrame()
+        df_why_result = format_why_result(why_result)
 
     for idx, entry in enumerate(st.session_state.chat_history):
         if entry.get("sql") == st.session_state.ex_sql:
@@ -620,9 +727,9 @@ def get_why_result(result_df):
     return df_why_result
 
 def extract_month_year_from_sql(sql_query):
-    """Extract month and year from SQL WHERE clause and CASE WHEN statements."""
+    """Extract month and year from SQL WHERE clause and CASE WHEN statements, of SQL text or a parsed query."""
     try:
-        expression = parse_one(sql_query)
+        expression = parse_one(sql_query) if isinstance(sql_query, str) else sql_query
         month_values, year_values = [], []
 
         def _extract_condition(expr):
@@ -664,9 +771,9 @@ def extract_month_year_from_sql(sql_query):
         return None, None
 
 def extract_limit_from_sql(sql_query):
-    """Extract LIMIT value from SQL query using sqlglot."""
+    """Extract LIMIT value from SQL query using sqlglot, of SQL text or a parsed query."""
     try:
-        expression = parse_one(sql_query)
+        expression = parse_one(sql_query) if isinstance(sql_query, str) else sql_query
         limit_exp = expression.find(exp.Limit)
         if limit_exp:
             # LIMIT value is usually in `this`
@@ -676,10 +783,10 @@ def extract_limit_from_sql(sql_query):
         print(f"Error parsing SQL for LIMIT: {e}")
         return None
 
-def get_comparison_year_month(df: pd.DataFrame):
+def get_comparison_year_month(df):
     """Get month/year comparison values (2 or 3 months based on user choice)."""
-    available_years = sorted(df.year.unique().tolist(), reverse=True)
-    available_months = sorted(df.month.unique().tolist())
+    available_years, available_months = available_years_months(df)
+    available_years = sorted(available_years, reverse=True)
 
     print("Enter in the Comparison Query")
 
@@ -1,8 +1,8 @@
 import os
 import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
 from datetime import datetime, timedelta
-from src.constants.data_paths import LOG_PATH
+from src.constants.data_paths import LOG_PATH, PROFILE_LOG_PATH
 
 
 os.makedirs(LOG_PATH, exist_ok=True)
@@ -21,6 +21,18 @@ file_handler.setLevel(logging.DEBUG)
 file_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 
+# DuckDB query profiles, one JSON record per line, rotated by size in their own
+# directory so the cleanup of old logs below leaves them alone
+os.makedirs(PROFILE_LOG_PATH, exist_ok=True)
+profile_logger = logging.getLogger("aisight_llm.profiles")
+profile_logger.setLevel(logging.INFO)
+profile_logger.propagate = False
+profile_handler = RotatingFileHandler(
+    filename=os.path.join(PROFILE_LOG_PATH, "query_profiles.jsonl"), maxBytes=10 * 1024**2, backupCount=5
+)
+profile_handler.setFormatter(logging.Formatter("%(message)s"))
+profile_logger.addHandler(profile_handler)
+
 
 def cleanup_old_logs(directory, keep_days=2):
 
@@ -0,0 +1,109 @@
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+from pathlib import Path
+
+from src.constants import *
+
+# Members per level of the synthetic location and product hierarchies, each
+# member is assigned one parent on the level above
+LOCATION_CARDINALITY = {
+    "region": 5, "city": 25, "area": 80, "territory": 250,
+    "distributor": 900, "route": 6_000, "customer": 150_000,
+}
+PRODUCT_CARDINALITY = {"brand": 20, "variant": 60, "packtype": 12, "sku": 400}
+LABEL_PREFIX = {
+    "region": "Region", "city": "City", "area": "Area", "territory": "Terr",
+    "distributor": "Dist", "route": "Route", "customer": "C",
+    "brand": "Brand", "variant": "Var", "packtype": "Pack", "sku": "SKU",
+}
+
+# Rows are written in fixed chunks, each drawn from its own seeded generator,
+# so a file only depends on its row count, periods and seed
+CHUNK_ROWS = 1_000_000
+FIRST_YEAR = 2023
+SCALES = {"1m": 1_000_000, "10m": 10_000_000, "50m": 50_000_000}
+
+
+def build_hierarchy(rng: np.random.Generator) -> dict:
+    """Parent index of every member, per hierarchy level below the top one."""
+    parents = {}
+    levels = list(LOCATION_CARDINALITY)
+    for parent, child in zip(levels, levels[1:]):
+        parents[child] = rng.integers(0, LOCATION_CARDINALITY[parent], LOCATION_CARDINALITY[child])
+    for level in ["brand", "variant", "packtype"]:
+        parents[level] = rng.integers(0, PRODUCT_CARDINALITY[level], PRODUCT_CARDINALITY["sku"])
+    return parents
+
+
+def labels(level: str) -> pa.Array:
+    """Raw, not yet cleaned, member names of a level, as found in source drops."""
+    size = LOCATION_CARDINALITY.get(level) or PRODUCT_CARDINALITY[level]
+    return pa.array([f"{LABEL_PREFIX[level]} {i}" for i in range(size)])
+
+
+def flags(rng: np.random.Generator, rows: int, share: float) -> pa.Array:
+    """True/False text flags, spelled like the pandas exports of the source system."""
+    return pc.if_else(pa.array(rng.random(rows) < share), "True", "False")
+
+
+def generate_chunk(
+    chunk_no: int, rows: int, first_row: int, total_rows: int, periods: int, parents: dict, seed: int
+) -> pa.Table:
+    """One chunk of synthetic rows with the `COLUMNS_MAP` source columns."""
+    rng = np.random.default_rng([seed, chunk_no])
+
+    # Members of each location level follow from the customer up the hierarchy
+    members = {"customer": rng.integers(0, LOCATION_CARDINALITY["customer"], rows)}
+    levels = list(LOCATION_CARDINALITY)
+    for child, parent in zip(levels[::-1], levels[::-1][1:]):
+        members[parent] = parents[child][members[child]]
+    members["sku"] = rng.integers(0, PRODUCT_CARDINALITY["sku"], rows)
+    for level in ["brand", "variant", "packtype"]:
+        members[level] = parents[level][members["sku"]]
+
+    # Rows are spread evenly over the periods, in order, like monthly drops
+    period = (np.arange(first_row, first_row + rows, dtype=np.int64) * periods) // total_rows
+    measures = {
+        "sales": 5_000, "primary sales": 5_000, "target": 6_000, "mro": 300, "mto": 300,
+        "unproductive_mro": 100, "unassorted_mro": 100, "stockout_mro": 100,
+    }
+    columns = {
+        "month": pa.array(period % 12 + 1),
+        "year": pa.array(FIRST_YEAR + period // 12),
+        **{col: pa.array(rng.integers(0, high, rows)) for col, high in measures.items()},
+        **{level: labels(level).take(pa.array(idx)) for level, idx in members.items()},
+        "productivity": flags(rng, rows, 0.7),
+        "stockout": flags(rng, rows, 0.1),
+        "assortment": flags(rng, rows, 0.6),
+    }
+    return pa.table({col: columns[col] for col in COLUMNS_MAP})
+
+
+def generate_source(path: Path, rows: int, periods: int = 24, seed: int = 7) -> Path:
+    """Write a deterministic gzip CSV drop of `rows` rows over `periods` months."""
+    parents = build_hierarchy(np.random.default_rng(seed))
+    partial_file = path.with_suffix(".partial")
+    with pa.CompressedOutputStream(partial_file.as_posix(), "gzip") as stream:
+        writer = None
+        for chunk_no, first_row in enumerate(range(0, rows, CHUNK_ROWS)):
+            chunk_rows = min(CHUNK_ROWS, rows - first_row)
+            table = generate_chunk(chunk_no, chunk_rows, first_row, rows, periods, parents, seed)
+            if writer is None:
+                writer = pv.CSVWriter(stream, table.schema, write_options=pv.WriteOptions(quoting_style="none"))
+            writer.write_table(table)
+        writer.close()
+    partial_file.replace(path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic gzip CSV drop.")
+    parser.add_argument("scale", help=f"row count or one of {', '.join(SCALES)}")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--periods", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    generate_source(args.output, SCALES.get(args.scale) or int(args.scale), args.periods, args.seed)
@@ -0,0 +1,119 @@
+import gzip
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.llm_code.data_processor_and_loader as loader
+from src.llm_code.data_processor_and_loader import clean_category_values, clean_column_values
+from src.utils.synthetic_data import generate_source
+
+
+def assert_same_cleaning(values: pd.Series) -> None:
+    expected = values.map(clean_column_values).astype(object)
+    pd.testing.assert_series_equal(clean_category_values(values), expected)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        pd.Series(["  Region-1 ", "region 1", None, np.nan, "CITY_2", "city_2"], name="region"),
+        pd.Series(["Lahore", 7, 3.5, True, False, None, "lahore!"], dtype=object),
+        pd.Series(["Karachi", "  KARACHI", None, "Quetta"], dtype="category"),
+        pd.Series(["Café Münster", "ÇAY ŞEKER", "東京 店", "naïve—route", "Café Münster"]),
+        pd.Series([np.nan, None, pd.NA], dtype=object),
+        pd.Series([], dtype=object),
+    ],
+    ids=["strings-and-missing", "mixed-types", "categorical", "unicode", "all-missing", "empty"],
+)
+def test_clean_category_values_matches_per_value_cleaning(values):
+    assert_same_cleaning(values)
+
+
+def test_clean_category_values_keeps_index_and_name():
+    values = pd.Series(["A ", None, "b"], index=[10, 20, 30], name="city")
+    cleaned = clean_category_values(values)
+    assert cleaned.index.tolist() == [10, 20, 30]
+    assert cleaned.name == "city"
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path.joinpath("cache")
+    cache_dir.mkdir()
+    monkeypatch.setattr(loader, "CACHED_PATH", cache_dir)
+    return cache_dir
+
+
+def cache_row_count() -> int:
+    with duckdb.connect(loader.cache_location().as_posix(), read_only=True) as conn:
+        return conn.execute("SELECT COUNT(*) FROM llm_df").fetchone()[0]
+
+
+def test_overlapping_sources_of_one_call_are_appended_once(tmp_path, cache_dir):
+    source = generate_source(tmp_path.joinpath("drop.gz"), 20_000, periods=2)
+    # The same rows with other bytes, as a re-export of a cumulative drop would have
+    copy = tmp_path.joinpath("drop-copy.gz")
+    copy.write_bytes(gzip.compress(gzip.decompress(source.read_bytes()), compresslevel=1))
+
+    loader.ingest_sources([source, copy])
+
+    assert cache_row_count() == 20_000
+    rows = sorted(entry["rows"] for entry in loader.load_manifest()["sources"].values())
+    assert rows == [0, 20_000]
+
+
+def test_late_regional_source_of_a_cached_month_is_appended(tmp_path, cache_dir):
+    source = generate_source(tmp_path.joinpath("drop.gz"), 20_000, periods=2)
+    rows = pd.read_csv(source, dtype=str)
+    regions = sorted(rows["region"].unique())
+    regional = []
+    for i, region in enumerate(regions):
+        path = tmp_path.joinpath(f"region-{i}.gz")
+        rows[rows["region"] == region].to_csv(path, index=False, compression="gzip")
+        regional.append(path)
+
+    loader.ingest_sources(regional[:-1])
+    loader.ingest_sources(regional[-1:])
+
+    assert cache_row_count() == 20_000
+
+
+def test_corrupt_source_is_skipped_and_the_rest_ingested(tmp_path, cache_dir):
+    source = generate_source(tmp_path.joinpath("drop.gz"), 20_000, periods=2)
+    corrupt = tmp_path.joinpath("corrupt.gz")
+    corrupt.write_bytes(source.read_bytes()[: source.stat().st_size // 2])
+
+    loader.ingest_sources([corrupt, source])
+
+    assert cache_row_count() == 20_000
+    manifest = loader.load_manifest()
+    assert [entry["name"] for entry in manifest["failed"].values()] == ["corrupt.gz"]
+    assert [entry["name"] for entry in manifest["sources"].values()] == ["drop.gz"]
+
+    # Later calls leave the failed source alone until its bytes change
+    loader.ingest_sources([corrupt, source])
+    assert loader.load_manifest() == manifest
+
+
+def test_cache_under_a_path_with_a_quote(tmp_path, monkeypatch):
+    cache_dir = tmp_path.joinpath("o'brien", "cache")
+    cache_dir.mkdir(parents=True)
+    monkeypatch.setattr(loader, "CACHED_PATH", cache_dir)
+    source = generate_source(tmp_path.joinpath("drop.gz"), 5_000, periods=1)
+
+    loader.ingest_sources([source])
+
+    assert cache_row_count() == 5_000
+
+
+@pytest.mark.parametrize("setting, value", [("CSV_READER", "pandas"), ("STREAMING_INGEST", False)])
+def test_reader_settings_change_the_fingerprint(monkeypatch, setting, value):
+    loader.processing_fingerprint.cache_clear()
+    default = loader.processing_fingerprint()
+    monkeypatch.setattr(loader, setting, value)
+    loader.processing_fingerprint.cache_clear()
+    try:
+        assert loader.processing_fingerprint() != default
+    finally:
+        loader.processing_fingerprint.cache_clear()
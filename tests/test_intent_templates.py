@@ -0,0 +1,95 @@
+import duckdb
+import pyarrow as pa
+import pytest
+
+from src.llm_code.data_processor_and_loader import read_arrow_batches
+from src.llm_code.intent_templates import parse_intent, template_sql
+from src.utils.synthetic_data import generate_source
+
+
+@pytest.mark.parametrize(
+    "question, intent",
+    [
+        (
+            "Top 5 cities by sales in March 2024",
+            {"kind": "ranking", "group_by": "region, city", "metric": "sales", "flag": None,
+             "ranking": "high", "limit": 5, "month": 3, "year": 2024},
+        ),
+        (
+            "Which region had the highest unproductive percentage in June?",
+            {"kind": "flag", "group_by": "region", "metric": None, "flag": ("productivity", True),
+             "ranking": "high", "limit": 1, "month": 6, "year": 2024},
+        ),
+        (
+            "Show the worst 3 areas for stockout in month 2",
+            {"kind": "flag", "group_by": "region, city, area", "metric": None, "flag": ("stockout", False),
+             "ranking": "worst", "limit": 3, "month": 2, "year": 2024},
+        ),
+        (
+            "Lowest mro distributor in 5th month 2023",
+            {"kind": "ranking", "group_by": "region, city, area, territory, distributor", "metric": "mro",
+             "flag": None, "ranking": "low", "limit": 1, "month": 5, "year": 2023},
+        ),
+        (
+            "Which 2 areas grew the most in mro in January?",
+            {"kind": "growth", "group_by": "region, city, area", "metric": "mro", "flag": None,
+             "ranking": "high", "limit": 2, "month": 1, "year": 2024},
+        ),
+    ],
+)
+def test_parse_intent(question, intent):
+    assert parse_intent(question, 2024) == intent
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Top 5 cities by sales in March and April",
+        "Top 5 cities by sales for brand X in March",
+        "Which region showed the highest sales in March",
+        "Top cities by sales",
+        "Top cities and regions by sales in March",
+        "Highest sales and mro region in March",
+        "Top 5 cities by sales in March 2023 and 2024",
+    ],
+)
+def test_questions_left_to_the_llm(question):
+    assert parse_intent(question, 2024) is None
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    """An in-memory table of 20k synthetic rows over three months of 2023."""
+    source = generate_source(tmp_path_factory.mktemp("drop").joinpath("drop.gz"), 20_000, periods=3)
+    conn = duckdb.connect()
+    conn.register("source_rows", pa.concat_tables(read_arrow_batches(source)))
+    conn.execute("CREATE TABLE llm_df AS SELECT * FROM source_rows")
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize(
+    "question, columns",
+    [
+        ("Top 5 cities by sales in March 2023", ["region", "city", "total_sales"]),
+        ("Which 2 areas grew the most in mro in February 2023?",
+         ["region", "city", "area", "mro_current_month", "mro_previous_month", "mro_growth_percentage"]),
+        ("Which region had the highest unproductive percentage in January 2023?",
+         ["region", "productive_shops", "un_productive_shops", "total_shops",
+          "productive_percentage", "un_productive_percentage"]),
+    ],
+)
+def test_template_sql_runs(conn, question, columns):
+    relation = conn.sql(template_sql(question, 2023))
+    rows = relation.fetchall()
+    assert relation.columns == columns
+    assert 1 <= len(rows) <= parse_intent(question, 2023)["limit"]
+
+
+def test_ranking_template_matches_its_order(conn):
+    lowest = conn.sql(template_sql("Bottom 3 cities by sales in February 2023", 2023)).fetchall()
+    expected = conn.execute(
+        "SELECT region, city, SUM(sales) FROM llm_df WHERE year = 2023 AND month = 2 "
+        "GROUP BY region, city ORDER BY 3 ASC LIMIT 3"
+    ).fetchall()
+    assert lowest == expected
@@ -0,0 +1,48 @@
+import duckdb
+import pyarrow as pa
+import pytest
+
+from src.llm_code.query_engine import execute_query, paged_sql
+
+# Many rows per key, so any order but the tiebreakers leaves ties
+TABLE = pa.table({
+    "region": pa.array([f"r{i % 4}" for i in range(5_000)]),
+    "city": pa.array([f"c{i % 50}" for i in range(5_000)]),
+    "sales": pa.array([i % 7 for i in range(5_000)], pa.int64()),
+})
+
+
+@pytest.mark.parametrize(
+    "query, page_rows",
+    [
+        ("SELECT * FROM llm_df", 700),
+        ("SELECT region, city, SUM(sales) AS sales FROM llm_df GROUP BY region, city ORDER BY sales DESC", 30),
+        ("SELECT region FROM llm_df UNION ALL SELECT city FROM llm_df", 700),
+    ],
+)
+def test_pages_cover_the_result_once(query, page_rows):
+    first = execute_query(TABLE, query, max_rows=page_rows)
+    assert first.truncated
+
+    rows = first.to_pandas().to_dict("records")
+    while len(rows) < first.total_rows:
+        rows += first.page(TABLE, offset=len(rows), rows=page_rows).to_dict("records")
+
+    conn = duckdb.connect()
+    conn.register("llm_df", TABLE)
+    expected = conn.sql(query).df().to_dict("records")
+    assert sorted(map(repr, rows)) == sorted(map(repr, expected))
+
+
+def test_paged_sql_keeps_the_query_order():
+    conn = duckdb.connect()
+    conn.register("llm_df", TABLE)
+    query = "SELECT city, SUM(sales) AS sales FROM llm_df GROUP BY city ORDER BY sales DESC"
+    pages = [conn.sql(paged_sql(query, 2, offset, 20)).fetchall() for offset in (0, 20, 40)]
+    rows = [row for page in pages for row in page]
+    assert rows == sorted(conn.sql(query).fetchall(), key=lambda row: (-row[1], row[0]))
+
+    # A query's own LIMIT is applied before the page is cut
+    limited = paged_sql(query + " LIMIT 30", 2, 20, 20)
+    assert conn.sql(limited).fetchall() == rows[20:30]
+    assert paged_sql("SELECT FROM WHERE", 2, 40, 20).endswith("ORDER BY ALL LIMIT 20 OFFSET 40")
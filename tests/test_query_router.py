@@ -0,0 +1,81 @@
+import duckdb
+import pyarrow as pa
+import pytest
+
+from src.constants import *
+from src.llm_code.data_processor_and_loader import read_arrow_batches
+from src.llm_code.query_router import append_rollups, rollup_table, route_query
+from src.utils.synthetic_data import generate_source
+
+ROLLUPS = {rollup_table(level) for level in HIERARCHY_COLUMNS}
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    """A small in-memory store: 20k synthetic rows over three months of 2023 with every rollup."""
+    source = generate_source(tmp_path_factory.mktemp("drop").joinpath("drop.gz"), 20_000, periods=3)
+    table = pa.concat_tables(read_arrow_batches(source))
+    conn = duckdb.connect()
+    conn.register("source_rows", table)
+    conn.execute("CREATE TABLE llm_df AS SELECT * FROM source_rows")
+    append_rollups(conn, "memory", "llm_df")
+    yield conn
+    conn.close()
+
+
+def run(conn, query: str) -> tuple[list, list, list]:
+    """Output names, types and sorted rows of a query."""
+    relation = conn.sql(query)
+    return relation.columns, [str(column_type) for column_type in relation.types], sorted(relation.fetchall(), key=repr)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT region, SUM(sales) AS total_sales FROM llm_df WHERE year = 2023 AND month = 1 GROUP BY region",
+        "SELECT region, city, COUNT(*) FROM llm_df WHERE year = 2023 AND month = 2 GROUP BY region, city",
+        "SELECT city, COUNT(*) AS shops, SUM(mro - unproductive_mro) AS productive_mro FROM llm_df GROUP BY city HAVING COUNT(*) > 500",
+        "SELECT DISTINCT region FROM llm_df WHERE month = 3",
+        "SELECT COUNT(DISTINCT city) FROM llm_df WHERE year = 2023",
+        "SELECT territory, SUM(CASE WHEN month = 1 THEN sales ELSE 0 END) AS january FROM llm_df GROUP BY territory",
+        "SELECT MAX(month), COUNT(*) FROM llm_df",
+    ],
+)
+def test_routed_query_matches_the_base_table(store, query):
+    routed = route_query(query, ROLLUPS)
+    assert "rollup_" in routed
+    assert run(store, routed) == run(store, query)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        # Row-level selects return every base row, a rollup one row per group
+        "SELECT region, city FROM llm_df WHERE year = 2023 AND month = 1",
+        # The name of an unaliased expression around COUNT(*) would change
+        "SELECT region, COUNT(*) * 2 FROM llm_df GROUP BY region",
+        "SELECT customer, SUM(sales) FROM llm_df GROUP BY customer",
+        "SELECT region, AVG(sales) FROM llm_df GROUP BY region",
+        "SELECT region, SUM(sales * 2) FROM llm_df GROUP BY region",
+        "SELECT region, SUM(sales) FROM llm_df WHERE brand = 'brand 1' GROUP BY region",
+        "SELECT * FROM llm_df",
+        "SELECT region FROM llm_df WHERE sales > (SELECT AVG(sales) FROM llm_df) GROUP BY region",
+        "SELECT region, SUM(sales) OVER () FROM llm_df",
+        "not sql at all (",
+    ],
+)
+def test_unsafe_query_is_not_routed(query):
+    assert route_query(query, ROLLUPS) == query
+
+
+def test_query_is_not_routed_without_its_rollup():
+    query = "SELECT city, SUM(sales) FROM llm_df GROUP BY city"
+    assert route_query(query, {rollup_table("region")}) == query
+
+
+def test_routed_count_keeps_its_name_and_type(store):
+    query = "SELECT region, COUNT(*) FROM llm_df WHERE month = 1 GROUP BY region"
+    names, types, rows = run(store, route_query(query, ROLLUPS))
+    assert names == ["region", "count_star()"]
+    assert types[1] == "BIGINT"
+    assert (names, types, rows) == run(store, query)
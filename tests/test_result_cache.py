@@ -0,0 +1,95 @@
+import pyarrow as pa
+import pytest
+
+from src.llm_code.query_engine import QueryResult
+from src.llm_code.result_cache import ResultCache, canonical_sql
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        (
+            "select city, sum(sales) from llm_df where month = 3 group by city",
+            "SELECT  City ,SUM(Sales)\nFROM llm_df WHERE month=3 GROUP BY city",
+        ),
+        (
+            "SELECT SUM(sales) FROM llm_df WHERE month IN (3, 1, 2)",
+            "SELECT SUM(sales) FROM llm_df WHERE month IN (1, 2, 3)",
+        ),
+        (
+            "SELECT SUM(sales) FROM llm_df WHERE year = 2024 AND month = 3 AND region = 'North'",
+            "SELECT SUM(sales) FROM llm_df WHERE region = 'North' AND month = 3 AND year = 2024",
+        ),
+        (
+            "SELECT SUM(sales) FROM llm_df WHERE month = 03",
+            "SELECT SUM(sales) FROM llm_df WHERE month = 3",
+        ),
+        (
+            "SELECT city AS c, SUM(sales) AS total FROM llm_df GROUP BY city ORDER BY total DESC",
+            "SELECT city AS place, SUM(sales) AS \"Sales Total\" FROM llm_df GROUP BY city ORDER BY \"Sales Total\" DESC",
+        ),
+    ],
+)
+def test_equivalent_queries_share_a_key(first, second):
+    assert canonical_sql(first)[0] == canonical_sql(second)[0]
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        (
+            "SELECT SUM(sales) FROM llm_df WHERE region = 'North'",
+            "SELECT SUM(sales) FROM llm_df WHERE region = 'north'",
+        ),
+        (
+            "SELECT SUM(sales) FROM llm_df WHERE month = 3 OR year = 2024",
+            "SELECT SUM(sales) FROM llm_df WHERE month = 3 AND year = 2024",
+        ),
+        (
+            "SELECT city, SUM(sales) FROM llm_df GROUP BY city ORDER BY 2 DESC LIMIT 5",
+            "SELECT city, SUM(sales) FROM llm_df GROUP BY city ORDER BY 2 DESC LIMIT 10",
+        ),
+    ],
+)
+def test_different_queries_keep_different_keys(first, second):
+    assert canonical_sql(first)[0] != canonical_sql(second)[0]
+
+
+def test_aliases_are_returned_in_their_written_case():
+    canonical, aliases = canonical_sql("SELECT city AS Place, SUM(sales) AS \"Sales Total\" FROM llm_df GROUP BY city")
+    assert canonical == "SELECT city AS _c0, SUM(sales) AS _c1 FROM llm_df GROUP BY city"
+    assert aliases == ["Place", "Sales Total"]
+
+
+def test_aliases_shadowing_a_column_are_kept():
+    # `sales` in ORDER BY means the output here, renaming it would point it at the column
+    query = "SELECT city, SUM(sales) AS sales FROM llm_df GROUP BY city ORDER BY sales"
+    canonical, aliases = canonical_sql(query)
+    assert canonical == query
+    assert aliases == []
+
+
+def result(rows: int) -> QueryResult:
+    table = pa.table({"value": pa.array(range(rows), pa.int64())})
+    return QueryResult("SELECT 1", table, rows)
+
+
+def test_cache_evicts_least_recently_used_within_budget():
+    entry = result(100)
+    cache = ResultCache(max_bytes=2 * entry.nbytes)
+    cache.put("a", entry)
+    cache.put("b", result(100))
+    assert cache.get("a") is entry
+    cache.put("c", result(100))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is entry
+    assert cache.get("c") is not None
+    assert cache.stats() == {"hits": 3, "misses": 1, "entries": 2, "bytes": 2 * entry.nbytes}
+
+
+def test_cache_skips_results_over_budget():
+    cache = ResultCache(max_bytes=10)
+    cache.put("a", result(100))
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
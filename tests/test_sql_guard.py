@@ -0,0 +1,97 @@
+import pytest
+from sqlglot import parse_one
+
+import src.llm_code.sql_guard as sql_guard
+from src.llm_code.sql_guard import estimate_rows, guard_query
+
+
+STATS = {
+    "columns": {
+        "year": {"distinct": 1},
+        "month": {"distinct": 3},
+        "region": {"distinct": 5},
+        "city": {"distinct": 50},
+        "sku": {"distinct": 1000},
+    },
+    "periods": [
+        {"year": 2024, "month": 1, "rows": 400_000},
+        {"year": 2024, "month": 2, "rows": 400_000},
+        {"year": 2024, "month": 3, "rows": 400_000},
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def guard_limits(monkeypatch):
+    monkeypatch.setattr(sql_guard, "GUARD_ENABLED", True)
+    monkeypatch.setattr(sql_guard, "GUARD_MAX_SCAN_ROWS", 500_000)
+    monkeypatch.setattr(sql_guard, "GUARD_MAX_RESULT_ROWS", 10_000)
+
+
+@pytest.mark.parametrize(
+    "query, scan_rows, output_rows",
+    [
+        ("SELECT SUM(sales) FROM llm_df", 1_200_000, 1),
+        ("SELECT region, SUM(sales) FROM llm_df WHERE month = 2 GROUP BY region", 400_000, 5),
+        ("SELECT region, SUM(sales) FROM llm_df WHERE month IN (1, 2) GROUP BY region", 800_000, 5),
+        ("SELECT * FROM llm_df WHERE (year = 2024 AND (month = 3 AND region = 'North'))", 400_000, 80_000),
+        ("SELECT * FROM llm_df WHERE month = 1 LIMIT 10", 400_000, 10),
+        ("SELECT city, sku, SUM(sales) FROM llm_df GROUP BY city, sku", 1_200_000, 50_000),
+    ],
+)
+def test_estimate_rows(query, scan_rows, output_rows):
+    assert estimate_rows(parse_one(query, read="duckdb"), STATS) == (scan_rows, output_rows)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "DELETE FROM llm_df",
+        "SELECT a.sales FROM llm_df a JOIN llm_df b ON a.city = b.city",
+    ],
+)
+def test_rejected_queries(query):
+    guarded, note = guard_query(query, STATS)
+    assert guarded is None
+    assert note
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT region, SUM(sales) FROM llm_df WHERE month = 3 GROUP BY region",
+        "SELECT month, SUM(sales) FROM llm_df GROUP BY month",
+        "WITH m AS (SELECT month, SUM(sales) AS s FROM llm_df GROUP BY month) SELECT * FROM m",
+        "SELECT FROM WHERE",
+    ],
+)
+def test_bounded_queries_unchanged(query):
+    assert guard_query(query, STATS) == (query, None)
+
+
+def test_unbounded_scan_gets_latest_month():
+    guarded, note = guard_query("SELECT region, SUM(sales) FROM llm_df WHERE region = 'North' OR region = 'South' GROUP BY region", STATS)
+    tree = parse_one(guarded, read="duckdb")
+    # The OR stays grouped, so the added period applies to both regions
+    assert tree.args["where"].sql(dialect="duckdb") == (
+        "WHERE (region = 'North' OR region = 'South') AND (year = 2024 AND month = 3)"
+    )
+    assert "3/2024" in note
+
+
+def test_large_output_gets_limit():
+    guarded, note = guard_query("SELECT * FROM llm_df WHERE month = 1", STATS)
+    assert parse_one(guarded, read="duckdb").args["limit"].expression.this == "10000"
+    assert "10,000" in note
+
+
+def test_without_stats_only_row_level_queries_are_limited():
+    aggregated = "SELECT region, SUM(sales) FROM llm_df GROUP BY region"
+    assert guard_query(aggregated, None) == (aggregated, None)
+    guarded, _ = guard_query("SELECT * FROM llm_df", None)
+    assert guarded == "SELECT * FROM llm_df LIMIT 10000"
+
+
+def test_guard_limit_leaves_rows_to_page():
+    from src.constants import GUARD_MAX_RESULT_ROWS, RESULT_MAX_ROWS
+    assert GUARD_MAX_RESULT_ROWS > RESULT_MAX_ROWS